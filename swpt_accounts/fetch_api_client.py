@@ -53,14 +53,15 @@ def get_root_config_data_dict(
     debtor_ids: Iterable[int], cache_seconds: float = 7200.0
 ) -> Dict[int, Optional[RootConfigData]]:
     cutoff_ts = time.time() - cache_seconds
-    result_dict: Dict[int, Optional[RootConfigData]] = {
-        debtor_id: None for debtor_id in debtor_ids
-    }
+    result_dict: Dict[int, Optional[RootConfigData]] = dict.fromkeys(
+        debtor_ids
+    )
+    unique_debtor_ids = list(result_dict)
     results = asyncio_loop.run_until_complete(
-        _fetch_root_config_data_list(debtor_ids, cutoff_ts)
+        _fetch_root_config_data_list(unique_debtor_ids, cutoff_ts)
     )
 
-    for debtor_id, result in zip(debtor_ids, results):
+    for debtor_id, result in zip(unique_debtor_ids, results):
         if isinstance(result, Exception):
             _log_error(result)
         else:
@@ -74,6 +74,9 @@ class RootConfigData(NamedTuple):
     issuing_limit: int = MAX_INT64
 
 
+DEFAULT_ROOT_CONFIG_DATA = RootConfigData()
+
+
 class classproperty(object):
     def __init__(self, f):
         self.f = f
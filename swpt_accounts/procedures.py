@@ -24,7 +24,7 @@ from swpt_accounts.models import (
     AccountUpdateSignal,
     AccountTransferSignal,
     FinalizationRequest,
-    RootConfigData,
+    DEFAULT_ROOT_CONFIG_DATA,
     T_INFINITY,
     ROOT_CREDITOR_ID,
     INTEREST_RATE_FLOOR,
@@ -1192,7 +1192,7 @@ def _get_min_account_balance(account: Account) -> int:
             # default configuration seems to be the reasonable thing to do.
             logger = logging.getLogger(__name__)
             logger.error("Invalid root config data for %s.", account)
-            config_data = RootConfigData()
+            config_data = DEFAULT_ROOT_CONFIG_DATA
 
         limit1 = contain_principal_overflow(config_data.issuing_limit)
         limit2 = contain_principal_overflow(int(account.negligible_amount))
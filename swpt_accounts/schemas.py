@@ -15,6 +15,7 @@ from swpt_accounts.models import (
     IRI_MAX_LENGTH,
     CONTENT_TYPE_MAX_BYTES,
     DEBTOR_INFO_SHA256_REGEX,
+    DEFAULT_ROOT_CONFIG_DATA,
     RootConfigData,
 )
 
@@ -183,7 +184,7 @@ _ROOT_CONFIG_DATA_SCHEMA = RootConfigDataSchema()
 
 def parse_root_config_data(config_data: str) -> RootConfigData:
     if config_data == "":
-        return RootConfigData()
+        return DEFAULT_ROOT_CONFIG_DATA
 
     try:
         data = _ROOT_CONFIG_DATA_SCHEMA.loads(config_data)
@@ -4,6 +4,7 @@ import flask_migrate
 from datetime import datetime, timezone
 from swpt_accounts import create_app
 from swpt_accounts.extensions import db
+from swpt_accounts.fetch_api_client import _clear_root_config_data
 
 server_name = "example.com"
 config_dict = {
@@ -35,6 +36,28 @@ def app(request):
         yield app
 
 
+@pytest.fixture(scope="module")
+def cli_runner(app):
+    """Get a Flask CLI runner for the application."""
+
+    return app.test_cli_runner()
+
+
+@pytest.fixture(autouse=True)
+def clear_root_config_data():
+    """Clear the cached root config data after each test."""
+
+    yield
+    _clear_root_config_data()
+
+
+@pytest.fixture(scope="function")
+def current_ts():
+    """Get the current time, as a timezone-aware datetime."""
+
+    return datetime.now(tz=timezone.utc)
+
+
 @pytest.fixture(scope="function")
 def db_session(app):
     """Get a Flask-SQLAlchmey session, with an automatic cleanup."""
@@ -43,20 +66,23 @@ def db_session(app):
 
     # Cleanup:
     db.session.remove()
-    for cmd in [
-        "TRUNCATE TABLE account CASCADE",
-        "TRUNCATE TABLE transfer_request",
-        "TRUNCATE TABLE finalization_request",
-        "TRUNCATE TABLE registered_balance_change CASCADE",
-        "TRUNCATE TABLE pending_balance_change",
-        "TRUNCATE TABLE rejected_transfer_signal",
-        "TRUNCATE TABLE prepared_transfer_signal",
-        "TRUNCATE TABLE finalized_transfer_signal",
-        "TRUNCATE TABLE account_transfer_signal",
-        "TRUNCATE TABLE account_update_signal",
-        "TRUNCATE TABLE account_purge_signal",
-        "TRUNCATE TABLE rejected_config_signal",
-        "TRUNCATE TABLE pending_balance_change_signal",
-    ]:
-        db.session.execute(sqlalchemy.text(cmd))
+    db.session.execute(
+        sqlalchemy.text(
+            "TRUNCATE TABLE"
+            " account,"
+            " transfer_request,"
+            " finalization_request,"
+            " registered_balance_change,"
+            " pending_balance_change,"
+            " rejected_transfer_signal,"
+            " prepared_transfer_signal,"
+            " finalized_transfer_signal,"
+            " account_transfer_signal,"
+            " account_update_signal,"
+            " account_purge_signal,"
+            " rejected_config_signal,"
+            " pending_balance_change_signal"
+            " CASCADE"
+        )
+    )
     db.session.commit()
@@ -1,5 +1,5 @@
 import pytest
-from datetime import datetime, timezone
+from datetime import datetime
 from swpt_accounts import procedures as p
 from swpt_accounts.models import RejectedTransferSignal, T_INFINITY
 from swpt_pythonlib.rabbitmq import MessageProperties
@@ -7,16 +7,22 @@ from swpt_accounts.actors import _configure_and_initialize_account
 
 D_ID = -1
 C_ID = 1
+FUTURE_TS = datetime.fromisoformat("2099-12-31T00:00:00+00:00")
+CONFIGURE_ACCOUNT_BODY = (
+    b'{"type":"ConfigureAccount","debtor_id":1,"creditor_id":2,'
+    b'"ts":"2099-12-31T00:00:00+00:00","seqnum":0,'
+    b'"negligible_amount":500.0,"config_flags":0,"config_data":""}'
+)
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def actors():
     from swpt_accounts import actors
 
     return actors
 
 
-def test_prepare_transfer(db_session, actors):
+def test_prepare_transfer(db_session, actors, current_ts):
     actors._on_prepare_transfer_signal(
         coordinator_type="test",
         coordinator_id=1,
@@ -28,7 +34,7 @@ def test_prepare_transfer(db_session, actors):
         recipient="1234",
         final_interest_rate_ts=T_INFINITY,
         max_commit_delay=1000000,
-        ts=datetime.now(tz=timezone.utc),
+        ts=current_ts,
     )
     actors._on_prepare_transfer_signal(
         coordinator_type="test",
@@ -41,7 +47,7 @@ def test_prepare_transfer(db_session, actors):
         recipient="invalid",
         final_interest_rate_ts=T_INFINITY,
         max_commit_delay=1000000,
-        ts=datetime.now(tz=timezone.utc),
+        ts=current_ts,
     )
     actors._on_prepare_transfer_signal(
         coordinator_type="agent",
@@ -54,7 +60,7 @@ def test_prepare_transfer(db_session, actors):
         recipient="1234",
         final_interest_rate_ts=T_INFINITY,
         max_commit_delay=1000000,
-        ts=datetime.now(tz=timezone.utc),
+        ts=current_ts,
     )
 
     p.process_transfer_requests(D_ID, C_ID)
@@ -69,7 +75,7 @@ def test_prepare_transfer(db_session, actors):
         assert rts.coordinator_request_id == 2
 
 
-def test_finalize_transfer(db_session, actors):
+def test_finalize_transfer(db_session, actors, current_ts):
     actors._on_finalize_transfer_signal(
         debtor_id=D_ID,
         creditor_id=C_ID,
@@ -80,23 +86,20 @@ def test_finalize_transfer(db_session, actors):
         committed_amount=100,
         transfer_note_format="",
         transfer_note="",
-        ts=datetime.now(tz=timezone.utc),
+        ts=current_ts,
     )
 
 
 def test_configure_account(db_session, actors):
-    from swpt_accounts.fetch_api_client import _clear_root_config_data
-
     actors._on_configure_account_signal(
         debtor_id=D_ID,
         creditor_id=C_ID,
-        ts=datetime.fromisoformat("2099-12-31T00:00:00+00:00"),
+        ts=FUTURE_TS,
         seqnum=0,
         negligible_amount=500.0,
         config_flags=0,
         config_data="",
     )
-    _clear_root_config_data()
 
 
 def test_on_pending_balance_change_signal(db_session, actors):
@@ -107,59 +110,37 @@ def test_on_pending_balance_change_signal(db_session, actors):
         coordinator_type="direct",
         transfer_note_format="",
         transfer_note="",
-        committed_at=datetime.fromisoformat("2099-12-31T00:00:00+00:00"),
+        committed_at=FUTURE_TS,
         principal_delta=1000,
         other_creditor_id=123,
     )
 
 
-def test_consumer(db_session, actors):
-    consumer = actors.SmpConsumer()
+@pytest.fixture(scope="module")
+def consumer(actors):
+    return actors.SmpConsumer()
 
-    props = MessageProperties(content_type="xxx")
-    assert consumer.process_message(b"body", props) is False
 
-    props = MessageProperties(content_type="application/json", type="xxx")
-    assert consumer.process_message(b"body", props) is False
+@pytest.mark.parametrize(
+    "content_type, message_type, body, is_processed",
+    [
+        ("xxx", None, b"body", False),
+        ("application/json", "xxx", b"body", False),
+        ("application/json", "ConfigureAccount", b"body", False),
+        ("application/json", "ConfigureAccount", b"{}", False),
+        ("application/json", "ConfigureAccount", CONFIGURE_ACCOUNT_BODY, True),
+    ],
+)
+def test_consumer(
+    db_session, consumer, content_type, message_type, body, is_processed
+):
+    props = MessageProperties(content_type=content_type, type=message_type)
+    assert consumer.process_message(body, props) is is_processed
 
-    props = MessageProperties(
-        content_type="application/json", type="ConfigureAccount"
-    )
-    assert consumer.process_message(b"body", props) is False
 
-    props = MessageProperties(
-        content_type="application/json", type="ConfigureAccount"
-    )
-    assert consumer.process_message(b"{}", props) is False
-
-    props = MessageProperties(
-        content_type="application/json", type="ConfigureAccount"
-    )
-    assert (
-        consumer.process_message(
-            b"""
-    {
-      "type": "ConfigureAccount",
-      "debtor_id": 1,
-      "creditor_id": 2,
-      "ts": "2099-12-31T00:00:00+00:00",
-      "seqnum": 0,
-      "negligible_amount": 500.0,
-      "config_flags": 0,
-      "config_data": ""
-    }
-    """,
-            props,
-        )
-        is True
-    )
-
-
-def test_set_interest_rate_on_new_accounts(app, db_session):
+def test_set_interest_rate_on_new_accounts(app, db_session, current_ts):
     from swpt_accounts.models import AccountUpdateSignal
-    from swpt_accounts.fetch_api_client import _clear_root_config_data
 
-    current_ts = datetime.now(tz=timezone.utc)
     p.configure_account(
         D_ID, p.ROOT_CREDITOR_ID, current_ts, 0, config_data='{"rate": 3.567}'
     )
@@ -169,5 +150,3 @@ def test_set_interest_rate_on_new_accounts(app, db_session):
 
     signals = AccountUpdateSignal.query.filter_by(creditor_id=C_ID).all()
     assert any(s.interest_rate == 3.567 for s in signals)
-
-    _clear_root_config_data()
@@ -7,6 +7,23 @@ from swpt_pythonlib.rabbitmq import MessageProperties
 
 D_ID = -1
 C_ID = 1
+ALL_FF_SHA256 = 64 * "F"
+CHANGE_INTEREST_RATE_SCHEMA = schemas.ChangeInterestRateMessageSchema()
+UPDATE_DEBTOR_INFO_SCHEMA = schemas.UpdateDebtorInfoMessageSchema()
+TRY_TO_DELETE_ACCOUNT_BODY = (
+    b'{"type":"TryToDeleteAccount","debtor_id":1,"creditor_id":2}'
+)
+CHANGE_INTEREST_RATE_BODY = (
+    b'{"type":"ChangeInterestRate","debtor_id":-2,"creditor_id":-1,'
+    b'"interest_rate":5.5,"ts":"2022-01-02T00:00:00Z","unknown":"ignored"}'
+)
+UPDATE_DEBTOR_INFO_BODY = (
+    b'{"type":"UpdateDebtorInfo","debtor_id":-2,"creditor_id":-1,'
+    b'"debtor_info_iri":"http://example.com/",'
+    b'"debtor_info_content_type":"text/plain",'
+    b'"debtor_info_sha256":"' + ALL_FF_SHA256.encode() + b'",'
+    b'"ts":"2022-01-02T00:00:00Z","unknown":"ignored"}'
+)
 
 
 def test_set_interest_rate(db_session):
@@ -31,7 +48,7 @@ def test_update_debtor_info(db_session):
         creditor_id=C_ID,
         debtor_info_iri="http://example.com",
         debtor_info_content_type="text/plain",
-        debtor_info_sha256="FF" * 32,
+        debtor_info_sha256=ALL_FF_SHA256,
         ts=datetime.fromisoformat("2019-12-31T00:00:00+00:00"),
     )
 
@@ -44,18 +61,9 @@ def test_try_to_delete_account(db_session):
 
 
 def test_change_interest_rate_schema():
-    s = schemas.ChangeInterestRateMessageSchema()
-
-    data = s.loads(
-        """{
-    "type": "ChangeInterestRate",
-    "debtor_id": -2,
-    "creditor_id": -1,
-    "interest_rate": 5.5,
-    "ts": "2022-01-02T00:00:00Z",
-    "unknown": "ignored"
-    }"""
-    )
+    s = CHANGE_INTEREST_RATE_SCHEMA
+
+    data = s.loads(CHANGE_INTEREST_RATE_BODY)
 
     assert data["type"] == "ChangeInterestRate"
     assert data["debtor_id"] == -2
@@ -82,27 +90,16 @@ def test_change_interest_rate_schema():
 
 
 def test_update_debtor_info_schema():
-    s = schemas.UpdateDebtorInfoMessageSchema()
-
-    data_str = """{
-    "type": "UpdateDebtorInfo",
-    "debtor_id": -2,
-    "creditor_id": -1,
-    "debtor_info_iri": "http://example.com/",
-    "debtor_info_content_type": "text/plain",
-    "debtor_info_sha256": "64*F",
-    "ts": "2022-01-02T00:00:00Z",
-    "unknown": "ignored"
-    }"""
-    data_str = data_str.replace("64*F", 64 * "F")
-    data = s.loads(data_str)
+    s = UPDATE_DEBTOR_INFO_SCHEMA
+
+    data = s.loads(UPDATE_DEBTOR_INFO_BODY)
 
     assert data["type"] == "UpdateDebtorInfo"
     assert data["debtor_id"] == -2
     assert data["creditor_id"] == -1
     assert data["debtor_info_iri"] == "http://example.com/"
     assert data["debtor_info_content_type"] == "text/plain"
-    assert data["debtor_info_sha256"] == 32 * "FF"
+    assert data["debtor_info_sha256"] == ALL_FF_SHA256
     assert data["ts"] == datetime.fromisoformat("2022-01-02T00:00:00+00:00")
     assert "unknown" not in data
 
@@ -129,7 +126,7 @@ def test_update_debtor_info_schema():
 
 def test_create_chore_message():
     current_ts = datetime.now()
-    s = schemas.UpdateDebtorInfoMessageSchema()
+    s = UPDATE_DEBTOR_INFO_SCHEMA
     m = chores.create_chore_message(
         {
             "type": "UpdateDebtorInfo",
@@ -155,38 +152,28 @@ def test_create_chore_message():
     assert m.properties.type == "UpdateDebtorInfo"
 
 
-def test_consumer(db_session):
-    consumer = chores.ChoresConsumer()
-
-    props = MessageProperties(content_type="xxx")
-    assert consumer.process_message(b"body", props) is False
-
-    props = MessageProperties(content_type="application/json", type="xxx")
-    assert consumer.process_message(b"body", props) is False
-
-    props = MessageProperties(
-        content_type="application/json", type="TryToDeleteAccount"
-    )
-    assert consumer.process_message(b"body", props) is False
+@pytest.fixture(scope="module")
+def consumer():
+    return chores.ChoresConsumer()
 
-    props = MessageProperties(
-        content_type="application/json", type="TryToDeleteAccount"
-    )
-    assert consumer.process_message(b"{}", props) is False
 
-    props = MessageProperties(
-        content_type="application/json", type="TryToDeleteAccount"
-    )
-    assert (
-        consumer.process_message(
-            b"""
-    {
-      "type": "TryToDeleteAccount",
-      "debtor_id": 1,
-      "creditor_id": 2
-    }
-    """,
-            props,
-        )
-        is True
-    )
+@pytest.mark.parametrize(
+    "content_type, message_type, body, is_processed",
+    [
+        ("xxx", None, b"body", False),
+        ("application/json", "xxx", b"body", False),
+        ("application/json", "TryToDeleteAccount", b"body", False),
+        ("application/json", "TryToDeleteAccount", b"{}", False),
+        (
+            "application/json",
+            "TryToDeleteAccount",
+            TRY_TO_DELETE_ACCOUNT_BODY,
+            True,
+        ),
+    ],
+)
+def test_consumer(
+    db_session, consumer, content_type, message_type, body, is_processed
+):
+    props = MessageProperties(content_type=content_type, type=message_type)
+    assert consumer.process_message(body, props) is is_processed
@@ -1,10 +1,12 @@
+import pytest
 import sqlalchemy
-from unittest.mock import Mock
+from operator import attrgetter
 from datetime import date, datetime, timezone, timedelta
 from sqlalchemy.sql.expression import true
 from swpt_accounts.extensions import db
 from swpt_accounts import procedures as p
 from swpt_accounts.models import (
+    Account,
     RejectedTransferSignal,
     TransferRequest,
     FinalizationRequest,
@@ -19,6 +21,19 @@ from swpt_pythonlib.utils import ShardingRealm
 
 D_ID = -1
 C_ID = 1
+PAST_TS = datetime(1970, 1, 1, tzinfo=timezone.utc)
+CREATION_DATE = date(1970, 1, 1)
+
+
+# Column values shared by the accounts in `test_scan_accounts()`.
+SCAN_ACCOUNT_DEFAULTS = dict(
+    debtor_id=D_ID,
+    creation_date=CREATION_DATE,
+    principal=1000,
+    total_locked_amount=500,
+    pending_transfers_count=1,
+    debtor_info_iri="http://example.com",
+)
 
 
 def _flush_balance_change_signals():
@@ -37,14 +52,30 @@ def _flush_balance_change_signals():
         )
 
 
-def test_process_transfers_pending_balance_changes(app, db_session):
+def _counts(*models):
+    # Counts the rows in each of the given tables, in a single query.
+    return tuple(
+        db.session.execute(
+            sqlalchemy.select(
+                *[
+                    sqlalchemy.select(sqlalchemy.func.count())
+                    .select_from(model)
+                    .scalar_subquery()
+                    for model in models
+                ]
+            )
+        ).one()
+    )
+
+
+def test_process_transfers_pending_balance_changes(db_session, cli_runner):
     p.make_debtor_payment("test", D_ID, C_ID, 1000)
     assert p.get_available_amount(D_ID, p.ROOT_CREDITOR_ID) is None
     _flush_balance_change_signals()
     _flush_balance_change_signals()
     _flush_balance_change_signals()
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+    db.session.commit()
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "process_balance_changes",
@@ -55,13 +86,16 @@ def test_process_transfers_pending_balance_changes(app, db_session):
     assert result.exit_code == 0
     assert not result.output
     assert p.get_available_amount(D_ID, p.ROOT_CREDITOR_ID) == -1000
-    assert RegisteredBalanceChange.query.filter(
-        RegisteredBalanceChange.is_applied == true()
-    ).all()
+    assert db.session.query(
+        RegisteredBalanceChange.query.filter(
+            RegisteredBalanceChange.is_applied == true()
+        ).exists()
+    ).scalar()
 
 
-def test_process_transfers_transfer_requests(app, db_session):
-    current_ts = datetime.now(tz=timezone.utc)
+def test_process_transfers_transfer_requests(
+    db_session, cli_runner, current_ts
+):
     p.configure_account(D_ID, 1234, current_ts, 0)
     p.prepare_transfer(
         coordinator_type="test",
@@ -74,9 +108,8 @@ def test_process_transfers_transfer_requests(app, db_session):
         recipient_creditor_id=1234,
         ts=current_ts,
     )
-    assert len(TransferRequest.query.all()) == 1
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+    assert TransferRequest.query.count() == 1
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "process_transfer_requests",
@@ -86,47 +119,30 @@ def test_process_transfers_transfer_requests(app, db_session):
     )
     assert result.exit_code == 0
     assert not result.output
-    assert len(RejectedTransferSignal.query.all()) == 1
-    assert len(TransferRequest.query.all()) == 0
+    assert RejectedTransferSignal.query.count() == 1
+    assert TransferRequest.query.count() == 0
 
 
-def test_process_transfers_finalization_requests(app, db_session):
-    p.make_debtor_payment("test", D_ID, C_ID, 1000)
-    p.process_pending_balance_changes(D_ID, C_ID)
-    p.prepare_transfer(
-        coordinator_type="test",
-        coordinator_id=1,
-        coordinator_request_id=2,
-        min_locked_amount=1,
-        max_locked_amount=200,
-        debtor_id=D_ID,
-        creditor_id=C_ID,
-        recipient_creditor_id=0,
-        ts=datetime.now(tz=timezone.utc),
-    )
-    p.process_transfer_requests(D_ID, C_ID)
-    pt = PreparedTransfer.query.one()
-    p.finalize_transfer(D_ID, C_ID, pt.transfer_id, "test", 1, 2, 1)
-    assert len(FinalizationRequest.query.all()) == 1
-    runner = app.test_cli_runner()
-    result = runner.invoke(
-        args=[
-            "swpt_accounts",
-            "process_finalization_requests",
-            "--quit-early",
-            "--wait=0",
-        ]
-    )
-    assert result.exit_code == 0
-    assert not result.output
-    assert len(FinalizedTransferSignal.query.all()) == 1
-    assert len(FinalizationRequest.query.all()) == 0
-
+@pytest.mark.parametrize(
+    "sharding_realm, finalized_transfers_count",
+    [(None, 1), ("0.#", 0)],
+    ids=["process", "ignore"],
+)
+def test_process_transfers_finalization_requests(
+    app,
+    db_session,
+    cli_runner,
+    monkeypatch,
+    current_ts,
+    sharding_realm,
+    finalized_transfers_count,
+):
+    if sharding_realm is not None:
+        monkeypatch.setitem(
+            app.config, "SHARDING_REALM", ShardingRealm(sharding_realm)
+        )
+        monkeypatch.setitem(app.config, "DELETE_PARENT_SHARD_RECORDS", True)
 
-def test_ignore_transfers_finalization_requests(app, db_session):
-    orig_sharding_realm = app.config["SHARDING_REALM"]
-    app.config["SHARDING_REALM"] = ShardingRealm("0.#")
-    app.config["DELETE_PARENT_SHARD_RECORDS"] = True
     p.make_debtor_payment("test", D_ID, C_ID, 1000)
     p.process_pending_balance_changes(D_ID, C_ID)
     p.prepare_transfer(
@@ -138,14 +154,13 @@ def test_ignore_transfers_finalization_requests(app, db_session):
         debtor_id=D_ID,
         creditor_id=C_ID,
         recipient_creditor_id=0,
-        ts=datetime.now(tz=timezone.utc),
+        ts=current_ts,
     )
     p.process_transfer_requests(D_ID, C_ID)
     pt = PreparedTransfer.query.one()
     p.finalize_transfer(D_ID, C_ID, pt.transfer_id, "test", 1, 2, 1)
-    assert len(FinalizationRequest.query.all()) == 1
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+    assert FinalizationRequest.query.count() == 1
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "process_finalization_requests",
@@ -155,18 +170,21 @@ def test_ignore_transfers_finalization_requests(app, db_session):
     )
     assert result.exit_code == 0
     assert not result.output
-    assert len(FinalizedTransferSignal.query.all()) == 0
-    assert len(FinalizationRequest.query.all()) == 0
-    app.config["DELETE_PARENT_SHARD_RECORDS"] = False
-    app.config["SHARDING_REALM"] = orig_sharding_realm
+    assert FinalizedTransferSignal.query.count() == finalized_transfers_count
+    assert FinalizationRequest.query.count() == 0
 
 
-def test_flush_messages(mocker, app, db_session):
-    send_signalbus_message = Mock()
+@pytest.fixture
+def stub_signalbus(mocker):
+    send_signalbus_message = mocker.Mock()
     mocker.patch(
         "swpt_accounts.models.RejectedTransferSignal.send_signalbus_message",
         new_callable=send_signalbus_message,
     )
+    yield send_signalbus_message
+
+
+def test_flush_messages(db_session, cli_runner, stub_signalbus):
     rts = RejectedTransferSignal(
         debtor_id=D_ID,
         sender_creditor_id=C_ID,
@@ -178,42 +196,51 @@ def test_flush_messages(mocker, app, db_session):
     )
     db.session.add(rts)
     db.session.commit()
-    assert len(RejectedTransferSignal.query.all()) == 1
-    db.session.commit()
+    assert RejectedTransferSignal.query.count() == 1
 
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "flush_messages",
             "RejectedTransferSignal",
-            "--wait",
-            "0.1",
             "--quit-early",
+            "--wait=0",
         ]
     )
     assert result.exit_code == 1
-    send_signalbus_message.assert_called_once()
-    assert len(RejectedTransferSignal.query.all()) == 0
+    stub_signalbus.assert_called_once()
+    assert RejectedTransferSignal.query.count() == 0
 
 
-def test_consume_messages(app):
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+def test_consume_messages(app, mocker, cli_runner):
+    spawn_worker_processes = mocker.patch(
+        "swpt_accounts.cli.spawn_worker_processes"
+    )
+    result = cli_runner.invoke(
         args=["swpt_accounts", "consume_messages", "--url=INVALID"]
     )
     assert result.exit_code == 1
+    spawn_worker_processes.assert_called_once()
+    kwargs = spawn_worker_processes.call_args.kwargs
+    assert kwargs["url"] == "INVALID"
+    assert kwargs["processes"] == app.config["PROTOCOL_BROKER_PROCESSES"]
 
 
-def test_consume_chore_messages(app):
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+def test_consume_chore_messages(app, mocker, cli_runner):
+    spawn_worker_processes = mocker.patch(
+        "swpt_accounts.cli.spawn_worker_processes"
+    )
+    result = cli_runner.invoke(
         args=["swpt_accounts", "consume_chore_messages", "--url=INVALID"]
     )
     assert result.exit_code == 1
+    spawn_worker_processes.assert_called_once()
+    kwargs = spawn_worker_processes.call_args.kwargs
+    assert kwargs["url"] == "INVALID"
+    assert kwargs["processes"] == app.config["CHORES_BROKER_PROCESSES"]
 
 
-def test_scan_accounts(app, db_session, mocker):
+def test_scan_accounts(db_session, mocker, cli_runner, current_ts):
     chores = []
 
     class MyPublisher:
@@ -225,16 +252,12 @@ def test_scan_accounts(app, db_session, mocker):
     )
 
     from swpt_accounts.models import (
-        Account,
         AccountUpdateSignal,
         AccountPurgeSignal,
         AccountTransferSignal,
         PendingBalanceChangeSignal,
     )
-    from swpt_accounts.fetch_api_client import _clear_root_config_data
 
-    current_ts = datetime.now(tz=timezone.utc)
-    past_ts = datetime(1970, 1, 1, tzinfo=timezone.utc)
     p.configure_account(
         D_ID,
         p.ROOT_CREDITOR_ID,
@@ -242,101 +265,76 @@ def test_scan_accounts(app, db_session, mocker):
         0,
         config_data='{"rate": 0.0, "info": {"iri": "http://example.com"}}',
     )
-    AccountUpdateSignal.query.delete()
-    account = Account(
-        debtor_id=D_ID,
-        creditor_id=12,
-        creation_date=date(1970, 1, 1),
-        principal=1000,
-        total_locked_amount=500,
-        pending_transfers_count=1,
-        last_transfer_id=3,
-        last_change_ts=past_ts,
-        last_heartbeat_ts=past_ts,
-        debtor_info_iri="http://example.com",
-    )
-    db.session.add(account)
-    db.session.add(
-        Account(
-            debtor_id=D_ID,
-            creditor_id=123,
-            creation_date=date(1970, 1, 1),
-            principal=1000,
-            total_locked_amount=500,
-            pending_transfers_count=1,
-            last_transfer_id=3,
-            status_flags=Account.STATUS_DELETED_FLAG,
-            last_change_ts=past_ts,
-            last_heartbeat_ts=past_ts,
-            debtor_info_iri="http://example.com",
-        )
-    )
-    db.session.add(
-        Account(
-            debtor_id=D_ID,
-            creditor_id=1234,
-            creation_date=date(1970, 1, 1),
-            principal=1000,
-            interest=20.0,
-            interest_rate=2.0,
-            total_locked_amount=500,
-            pending_transfers_count=1,
-            last_transfer_id=2,
-            last_change_ts=current_ts - timedelta(seconds=10),
-            last_heartbeat_ts=current_ts - timedelta(seconds=10),
-            debtor_info_iri="http://example.com",
-        )
-    )
-    db.session.add(
-        Account(
-            debtor_id=D_ID,
-            creditor_id=12345,
-            creation_date=date(1970, 1, 1),
-            principal=1000,
-            total_locked_amount=500,
-            pending_transfers_count=1,
-            last_transfer_id=1,
-            last_change_ts=past_ts,
-            last_heartbeat_ts=current_ts - timedelta(seconds=10),
-            debtor_info_iri="http://example.com",
-        )
-    )
-    db.session.add(
-        Account(
-            debtor_id=D_ID,
-            creditor_id=123456,
-            creation_date=date(1970, 1, 1),
-            principal=0,
-            total_locked_amount=0,
-            pending_transfers_count=0,
-            last_transfer_id=0,
-            config_flags=Account.CONFIG_SCHEDULED_FOR_DELETION_FLAG,
-            last_change_ts=current_ts,
-            last_heartbeat_ts=current_ts,
-            debtor_info_iri="http://example.com",
-        )
-    )
-    db.session.add(
-        Account(
-            debtor_id=D_ID,
-            creditor_id=1234567,
-            creation_date=date(1970, 1, 1),
-            principal=0,
-            total_locked_amount=0,
-            pending_transfers_count=0,
-            last_transfer_id=0,
-            last_change_ts=current_ts,
-            last_heartbeat_ts=current_ts,
+    db.session.execute(sqlalchemy.text("TRUNCATE TABLE account_update_signal"))
+    recent_ts = current_ts - timedelta(seconds=10)
+    db.session.execute(
+        sqlalchemy.insert(Account),
+        [
+            dict(
+                SCAN_ACCOUNT_DEFAULTS,
+                creditor_id=12,
+                last_transfer_id=3,
+                last_change_ts=PAST_TS,
+                last_heartbeat_ts=PAST_TS,
+            ),
+            dict(
+                SCAN_ACCOUNT_DEFAULTS,
+                creditor_id=123,
+                last_transfer_id=3,
+                status_flags=Account.STATUS_DELETED_FLAG,
+                last_change_ts=PAST_TS,
+                last_heartbeat_ts=PAST_TS,
+            ),
+            dict(
+                SCAN_ACCOUNT_DEFAULTS,
+                creditor_id=1234,
+                interest=20.0,
+                interest_rate=2.0,
+                last_transfer_id=2,
+                last_change_ts=recent_ts,
+                last_heartbeat_ts=recent_ts,
+            ),
+            dict(
+                SCAN_ACCOUNT_DEFAULTS,
+                creditor_id=12345,
+                last_transfer_id=1,
+                last_change_ts=PAST_TS,
+                last_heartbeat_ts=recent_ts,
+            ),
+            dict(
+                SCAN_ACCOUNT_DEFAULTS,
+                creditor_id=123456,
+                principal=0,
+                total_locked_amount=0,
+                pending_transfers_count=0,
+                last_transfer_id=0,
+                config_flags=Account.CONFIG_SCHEDULED_FOR_DELETION_FLAG,
+                last_change_ts=current_ts,
+                last_heartbeat_ts=current_ts,
+            ),
+            dict(
+                SCAN_ACCOUNT_DEFAULTS,
+                creditor_id=1234567,
+                principal=0,
+                total_locked_amount=0,
+                pending_transfers_count=0,
+                last_transfer_id=0,
+                last_change_ts=current_ts,
+                last_heartbeat_ts=current_ts,
+                debtor_info_iri=None,
+            ),
+        ],
+    )
+
+    db.session.execute(
+        sqlalchemy.text(
+            "ANALYZE account (debtor_id), prepared_transfer (debtor_id)"
         )
     )
     db.session.commit()
 
-    with db.engine.connect() as conn:
-        conn.execute(sqlalchemy.text("ANALYZE account"))
-
-    assert len(Account.query.all()) == 7
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+    assert Account.query.count() == 7
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "scan_accounts",
@@ -346,44 +344,63 @@ def test_scan_accounts(app, db_session, mocker):
         ]
     )
     assert result.exit_code == 0
-    assert len(Account.query.all()) == 6
-    assert len(AccountUpdateSignal.query.all()) == 1
+    assert _counts(
+        Account,
+        AccountUpdateSignal,
+        AccountTransferSignal,
+        PendingBalanceChangeSignal,
+    ) == (6, 1, 0, 0)
 
     # A heartbeat message
     acs = AccountUpdateSignal.query.one()
-    account = Account.query.filter_by(debtor_id=D_ID, creditor_id=12).one()
-    assert acs.debtor_id == account.debtor_id
-    assert acs.creditor_id == account.creditor_id
-    assert acs.last_change_ts == account.last_change_ts == past_ts
-    assert acs.last_change_seqnum == account.last_change_seqnum == 0
-    assert acs.principal == account.principal
-    assert acs.interest == account.interest
-    assert acs.interest_rate == account.interest_rate
-    assert acs.last_transfer_number == account.last_transfer_number
-    assert acs.last_config_ts == account.last_config_ts
-    assert acs.last_config_seqnum == account.last_config_seqnum
-    assert acs.creation_date == account.creation_date
-    assert acs.negligible_amount == account.negligible_amount
+    account = db.session.get(Account, (D_ID, 12))
+    shared_fields = attrgetter(
+        "debtor_id",
+        "creditor_id",
+        "last_change_ts",
+        "last_change_seqnum",
+        "principal",
+        "interest",
+        "interest_rate",
+        "last_transfer_number",
+        "last_config_ts",
+        "last_config_seqnum",
+        "creation_date",
+        "negligible_amount",
+        "config_flags",
+    )
+    assert shared_fields(acs) == shared_fields(account)
+    assert acs.last_change_ts == PAST_TS
+    assert acs.last_change_seqnum == 0
     assert acs.config_data == ""
-    assert acs.config_flags == account.config_flags
-
-    assert len(Account.query.all()) == 6
-    assert len(Account.query.filter_by(creditor_id=123).all()) == 0
-    aps = AccountPurgeSignal.query.filter_by(
-        debtor_id=D_ID, creditor_id=123
-    ).one()
-    assert aps.creation_date == date(1970, 1, 1)
 
-    assert len(AccountTransferSignal.query.all()) == 0
-    assert len(PendingBalanceChangeSignal.query.all()) == 0
+    assert Account.query.filter_by(creditor_id=123).count() == 0
+    assert (
+        db.session.execute(
+            sqlalchemy.select(AccountPurgeSignal.creation_date).filter_by(
+                debtor_id=D_ID, creditor_id=123
+            )
+        ).scalar_one()
+        == CREATION_DATE
+    )
 
     db.session.commit()
 
-    chores_consumer = ChoresConsumer()
-    for msg in chores:
-        chores_consumer.process_message(msg.body, msg.properties)
+    @db.atomic
+    def process_chores():
+        chores_consumer = ChoresConsumer()
+        for msg in chores:
+            chores_consumer.process_message(msg.body, msg.properties)
+
+    process_chores()
 
-    accounts = Account.query.order_by(Account.creditor_id).all()
+    accounts = db.session.execute(
+        sqlalchemy.text(
+            "SELECT creditor_id, last_heartbeat_ts, interest_rate,"
+            " status_flags, debtor_info_iri"
+            " FROM account ORDER BY creditor_id"
+        )
+    ).all()
     assert accounts[0].creditor_id == 0
     assert accounts[1].last_heartbeat_ts >= current_ts
     assert (
@@ -400,10 +417,7 @@ def test_scan_accounts(app, db_session, mocker):
         == p.ROOT_CREDITOR_ID
     )
 
-    with db.engine.connect() as conn:
-        conn.execute(sqlalchemy.text("ANALYZE prepared_transfer"))
-
-    result = runner.invoke(
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "scan_prepared_transfers",
@@ -413,22 +427,16 @@ def test_scan_accounts(app, db_session, mocker):
         ]
     )
     assert result.exit_code == 0
-    assert len(Account.query.all()) == 6
-    assert len(AccountUpdateSignal.query.all()) == 4
-
-    _clear_root_config_data()
+    assert _counts(Account, AccountUpdateSignal) == (6, 4)
 
 
-def test_delete_parent_accounts(app, db_session):
-    from swpt_accounts.models import Account, AccountUpdateSignal
-    from swpt_accounts.fetch_api_client import _clear_root_config_data
-
-    current_ts = datetime.now(tz=timezone.utc)
-    AccountUpdateSignal.query.delete()
+def test_delete_parent_accounts(
+    app, db_session, cli_runner, monkeypatch, current_ts
+):
     account = Account(
         debtor_id=D_ID,
         creditor_id=12,
-        creation_date=date(1970, 1, 1),
+        creation_date=CREATION_DATE,
         principal=1000,
         total_locked_amount=500,
         pending_transfers_count=1,
@@ -439,16 +447,14 @@ def test_delete_parent_accounts(app, db_session):
     )
     db.session.add(account)
     db.session.commit()
-    orig_sharding_realm = app.config["SHARDING_REALM"]
-    app.config["SHARDING_REALM"] = ShardingRealm("0.#")
-    app.config["DELETE_PARENT_SHARD_RECORDS"] = True
+    monkeypatch.setitem(app.config, "SHARDING_REALM", ShardingRealm("0.#"))
+    monkeypatch.setitem(app.config, "DELETE_PARENT_SHARD_RECORDS", True)
 
-    with db.engine.connect() as conn:
-        conn.execute(sqlalchemy.text("ANALYZE account"))
+    db.session.execute(sqlalchemy.text("ANALYZE account (debtor_id)"))
+    db.session.commit()
 
-    assert len(Account.query.all()) == 1
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+    assert Account.query.count() == 1
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "scan_accounts",
@@ -458,77 +464,66 @@ def test_delete_parent_accounts(app, db_session):
         ]
     )
     assert result.exit_code == 0
-    assert len(Account.query.all()) == 0
-
-    app.config["DELETE_PARENT_SHARD_RECORDS"] = False
-    app.config["SHARDING_REALM"] = orig_sharding_realm
-    _clear_root_config_data()
-
-
-def test_scan_prepared_transfers(app, db_session):
-    from swpt_accounts.models import (
-        Account,
-        PreparedTransfer,
-        PreparedTransferSignal,
-    )
-
-    current_ts = datetime.now(tz=timezone.utc)
-    past_ts = datetime(1970, 1, 1, tzinfo=timezone.utc)
-    db.session.add(
-        Account(
-            debtor_id=D_ID,
-            creditor_id=C_ID,
-            creation_date=date(1970, 1, 1),
-            principal=1000,
-            total_locked_amount=500,
-            pending_transfers_count=1,
-            last_transfer_id=2,
-            status_flags=0,
-        )
-    )
-    db.session.flush()
-    db.session.add(
-        PreparedTransfer(
-            debtor_id=D_ID,
-            sender_creditor_id=C_ID,
-            transfer_id=1,
-            coordinator_type="direct",
-            coordinator_id=11,
-            coordinator_request_id=111,
-            locked_amount=400,
-            recipient_creditor_id=1234,
-            final_interest_rate_ts=T_INFINITY,
-            prepared_at=current_ts,
-            deadline=current_ts + timedelta(days=30),
-            demurrage_rate=0.0,
-        )
-    )
-    db.session.add(
-        PreparedTransfer(
-            debtor_id=D_ID,
-            sender_creditor_id=C_ID,
-            transfer_id=2,
-            coordinator_type="direct",
-            coordinator_id=11,
-            coordinator_request_id=112,
-            locked_amount=100,
-            recipient_creditor_id=1234,
-            final_interest_rate_ts=T_INFINITY,
-            prepared_at=past_ts,
-            deadline=current_ts + timedelta(days=30),
-            demurrage_rate=0.0,
-        )
+    assert Account.query.count() == 0
+
+
+def test_scan_prepared_transfers(db_session, cli_runner, current_ts):
+    from swpt_accounts.models import PreparedTransfer, PreparedTransferSignal
+
+    db.session.execute(
+        sqlalchemy.insert(Account),
+        [
+            dict(
+                debtor_id=D_ID,
+                creditor_id=C_ID,
+                creation_date=CREATION_DATE,
+                principal=1000,
+                total_locked_amount=500,
+                pending_transfers_count=1,
+                last_transfer_id=2,
+                status_flags=0,
+            ),
+        ],
+    )
+    pt_defaults = dict(
+        debtor_id=D_ID,
+        sender_creditor_id=C_ID,
+        coordinator_type="direct",
+        coordinator_id=11,
+        recipient_creditor_id=1234,
+        final_interest_rate_ts=T_INFINITY,
+        deadline=current_ts + timedelta(days=30),
+        demurrage_rate=0.0,
+    )
+    db.session.execute(
+        sqlalchemy.insert(PreparedTransfer),
+        [
+            dict(
+                pt_defaults,
+                transfer_id=1,
+                coordinator_request_id=111,
+                locked_amount=400,
+                prepared_at=current_ts,
+            ),
+            dict(
+                pt_defaults,
+                transfer_id=2,
+                coordinator_request_id=112,
+                locked_amount=100,
+                prepared_at=PAST_TS,
+            ),
+        ],
+    )
+
+    db.session.execute(
+        sqlalchemy.text("ANALYZE prepared_transfer (debtor_id)")
     )
     db.session.commit()
 
-    with db.engine.connect() as conn:
-        conn.execute(sqlalchemy.text("ANALYZE prepared_transfer"))
-
-    assert len(Account.query.all()) == 1
-    assert len(PreparedTransfer.query.all()) == 2
-    assert len(PreparedTransferSignal.query.all()) == 0
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+    assert Account.query.count() == 1
+    assert PreparedTransfer.query.count() == 2
+    assert PreparedTransferSignal.query.count() == 0
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "scan_prepared_transfers",
@@ -538,13 +533,18 @@ def test_scan_prepared_transfers(app, db_session):
         ]
     )
     assert result.exit_code == 0
-    assert len(Account.query.all()) == 1
-    assert len(PreparedTransfer.query.all()) == 2
-    pt1 = PreparedTransfer.query.filter_by(transfer_id=1).one()
-    assert pt1.last_reminder_ts is None
-    pt2 = PreparedTransfer.query.filter_by(transfer_id=2).one()
-    assert pt2.last_reminder_ts is not None
-    assert len(PreparedTransferSignal.query.all()) == 1
+    assert Account.query.count() == 1
+    assert PreparedTransfer.query.count() == 2
+    last_reminder_ts = dict(
+        db.session.execute(
+            sqlalchemy.select(
+                PreparedTransfer.transfer_id, PreparedTransfer.last_reminder_ts
+            ).where(PreparedTransfer.transfer_id.in_([1, 2]))
+        ).all()
+    )
+    assert last_reminder_ts[1] is None
+    assert last_reminder_ts[2] is not None
+    assert PreparedTransferSignal.query.count() == 1
 
     pts = PreparedTransferSignal.query.all()[0]
     assert pts.debtor_id == D_ID
@@ -555,12 +555,9 @@ def test_scan_prepared_transfers(app, db_session):
     assert pts.coordinator_request_id == 112
     assert pts.locked_amount == 100
     assert pts.recipient_creditor_id == 1234
-    assert pts.prepared_at == past_ts
-
-    with db.engine.connect() as conn:
-        conn.execute(sqlalchemy.text("ANALYZE prepared_transfer"))
+    assert pts.prepared_at == PAST_TS
 
-    result = runner.invoke(
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "scan_prepared_transfers",
@@ -570,52 +567,38 @@ def test_scan_prepared_transfers(app, db_session):
         ]
     )
     assert result.exit_code == 0
-    assert len(Account.query.all()) == 1
-    assert len(PreparedTransfer.query.all()) == 2
-    assert len(PreparedTransferSignal.query.all()) == 1
+    assert Account.query.count() == 1
+    assert PreparedTransfer.query.count() == 2
+    assert PreparedTransferSignal.query.count() == 1
 
 
-def test_scan_registered_balance_changes(app, db_session):
+def test_scan_registered_balance_changes(db_session, cli_runner, current_ts):
     from swpt_accounts.models import RegisteredBalanceChange
 
-    current_ts = datetime.now(tz=timezone.utc)
-    past_ts = datetime(1970, 1, 1, tzinfo=timezone.utc)
-    db.session.add(
-        RegisteredBalanceChange(
-            debtor_id=D_ID,
-            other_creditor_id=C_ID,
-            change_id=1,
-            committed_at=past_ts,
-            is_applied=False,
-        )
-    )
-    db.session.add(
-        RegisteredBalanceChange(
-            debtor_id=D_ID,
-            other_creditor_id=C_ID,
-            change_id=2,
-            committed_at=past_ts,
-            is_applied=True,
-        )
+    db.session.execute(
+        sqlalchemy.insert(RegisteredBalanceChange),
+        [
+            dict(
+                debtor_id=D_ID,
+                other_creditor_id=C_ID,
+                change_id=change_id,
+                committed_at=committed_at,
+                is_applied=is_applied,
+            )
+            for change_id, (committed_at, is_applied) in enumerate(
+                [(PAST_TS, False), (PAST_TS, True), (current_ts, True)],
+                start=1,
+            )
+        ],
+    )
+
+    db.session.execute(
+        sqlalchemy.text("ANALYZE registered_balance_change (debtor_id)")
     )
-    db.session.add(
-        RegisteredBalanceChange(
-            debtor_id=D_ID,
-            other_creditor_id=C_ID,
-            change_id=3,
-            committed_at=current_ts,
-            is_applied=True,
-        )
-    )
-    db.session.flush()
     db.session.commit()
 
-    with db.engine.connect() as conn:
-        conn.execute(sqlalchemy.text("ANALYZE registered_balance_change"))
-
-    assert len(RegisteredBalanceChange.query.all()) == 3
-    runner = app.test_cli_runner()
-    result = runner.invoke(
+    assert RegisteredBalanceChange.query.count() == 3
+    result = cli_runner.invoke(
         args=[
             "swpt_accounts",
             "scan_registered_balance_changes",
@@ -625,6 +608,10 @@ def test_scan_registered_balance_changes(app, db_session):
         ]
     )
     assert result.exit_code == 0
-    assert len(RegisteredBalanceChange.query.all()) == 2
-    assert RegisteredBalanceChange.query.filter_by(change_id=1).one()
-    assert RegisteredBalanceChange.query.filter_by(change_id=3).one()
+    assert RegisteredBalanceChange.query.count() == 2
+    assert db.session.query(
+        RegisteredBalanceChange.query.filter_by(change_id=1).exists()
+    ).scalar()
+    assert db.session.query(
+        RegisteredBalanceChange.query.filter_by(change_id=3).exists()
+    ).scalar()
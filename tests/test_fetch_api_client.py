@@ -1,9 +1,8 @@
 import json
 import pytest
 import logging
-from datetime import datetime, timezone
 from flask import current_app
-from swpt_accounts.models import RootConfigData
+from swpt_accounts.models import RootConfigData, DEFAULT_ROOT_CONFIG_DATA
 from swpt_accounts.fetch_api_client import (
     parse_root_config_data,
     get_root_config_data_dict,
@@ -14,81 +13,69 @@ D_ID = -1
 C_ID = 1
 
 
-def test_parse_root_config_data():
-    default = RootConfigData()
+def test_root_config_data_defaults():
+    default = DEFAULT_ROOT_CONFIG_DATA
     assert default.interest_rate_target == 0.0
     assert default.info_content_type is None
     assert default.info_iri is None
     assert default.info_sha256 is None
     assert default.issuing_limit == 9223372036854775807
 
-    assert RootConfigData().interest_rate_target == 0.0
-    assert parse_root_config_data("") == RootConfigData()
-    assert parse_root_config_data("{}") == RootConfigData()
-    assert parse_root_config_data('{"rate": 99.5}') == RootConfigData(99.5)
-    assert parse_root_config_data('{"rate": -49.0}') == RootConfigData(-49.0)
-    assert parse_root_config_data(
-        '{"type": "RootConfigData", "rate": 0.0}'
-    ) == RootConfigData(0.0)
-
-    with pytest.raises(
-        ValueError, match="invalid root config data: 'NOT JSON'"
-    ):
-        parse_root_config_data("NOT JSON")
-
-    with pytest.raises(
-        ValueError, match="invalid root config data: '{\"rate\": NaN}'"
-    ):
-        parse_root_config_data('{"rate": NaN}')
-
-    with pytest.raises(
-        ValueError, match="invalid root config data: '{\"rate\": -51}'"
-    ):
-        parse_root_config_data('{"rate": -51}')
-
-    with pytest.raises(ValueError):
-        parse_root_config_data('{"rate": 101}')
-
-    with pytest.raises(ValueError):
-        parse_root_config_data('{"type": "INVALID_TYPE", "rate": 0.0}')
-
-    with pytest.raises(ValueError):
-        parse_root_config_data('{"info": {"iri": "%s"}}' % (201 * "x"))
-
-    with pytest.raises(ValueError):
-        parse_root_config_data(
-            '{"info": {"iri": "x", "contentType": "%s"}}' % (101 * "x")
-        )
-
-    with pytest.raises(ValueError):
-        parse_root_config_data('{"info": {"iri": "x", "contentType": "Щ"}}')
-
-    with pytest.raises(ValueError):
-        parse_root_config_data('{"limit": -1}')
-
-    with pytest.raises(ValueError):
-        parse_root_config_data('{"limit": 9223372036854775808}')
-
-    assert parse_root_config_data(
-        '{"info": {"iri": "http://example.com"}}'
-    ) == RootConfigData(0.0, "http://example.com")
-
-    data = parse_root_config_data(
-        json.dumps(
-            {
-                "rate": 1.0,
-                "info": {
-                    "iri": "http://example.com",
-                    "sha256": 32 * "20",
-                    "contentType": "text/plain",
-                },
-                "limit": 1000,
-            }
-        )
-    )
-    assert data == RootConfigData(
-        1.0, "http://example.com", 32 * b" ", "text/plain", 1000
-    )
+
+@pytest.mark.parametrize(
+    "config_data, expected",
+    [
+        ("", DEFAULT_ROOT_CONFIG_DATA),
+        ("{}", DEFAULT_ROOT_CONFIG_DATA),
+        ('{"rate": 99.5}', RootConfigData(99.5)),
+        ('{"rate": -49.0}', RootConfigData(-49.0)),
+        ('{"type": "RootConfigData", "rate": 0.0}', RootConfigData(0.0)),
+        (
+            '{"info": {"iri": "http://example.com"}}',
+            RootConfigData(0.0, "http://example.com"),
+        ),
+        (
+            json.dumps(
+                {
+                    "rate": 1.0,
+                    "info": {
+                        "iri": "http://example.com",
+                        "sha256": 32 * "20",
+                        "contentType": "text/plain",
+                    },
+                    "limit": 1000,
+                }
+            ),
+            RootConfigData(
+                1.0, "http://example.com", 32 * b" ", "text/plain", 1000
+            ),
+        ),
+    ],
+)
+def test_parse_root_config_data(config_data, expected):
+    assert parse_root_config_data(config_data) == expected
+
+
+@pytest.mark.parametrize(
+    "config_data",
+    [
+        "NOT JSON",
+        '{"rate": NaN}',
+        '{"rate": -51}',
+        '{"rate": 101}',
+        '{"type": "INVALID_TYPE", "rate": 0.0}',
+        '{"info": {"iri": "%s"}}' % (201 * "x"),
+        '{"info": {"iri": "x", "contentType": "%s"}}' % (101 * "x"),
+        '{"info": {"iri": "x", "contentType": "Щ"}}',
+        '{"limit": -1}',
+        '{"limit": 9223372036854775808}',
+    ],
+)
+def test_parse_invalid_root_config_data(config_data):
+    with pytest.raises(ValueError) as exc_info:
+        parse_root_config_data(config_data)
+
+    assert str(exc_info.value) == f"invalid root config data: '{config_data}'"
 
 
 def test_get_root_config_data_dict(app):
@@ -100,11 +87,25 @@ def test_get_root_config_data_dict(app):
     }
 
 
-def test_get_if_account_is_reachable(app, db_session, caplog):
+def test_get_root_config_data_dict_duplicates(app, mocker):
+    make_request = mocker.patch(
+        "swpt_accounts.fetch_api_client._make_root_config_data_request",
+        side_effect=lambda debtor_id: RootConfigData(float(debtor_id)),
+    )
+    debtor_ids = (i for i in [3, 1, 3, 2, 1])
+    assert get_root_config_data_dict(debtor_ids, cache_seconds=-1e6) == {
+        1: RootConfigData(1.0),
+        2: RootConfigData(2.0),
+        3: RootConfigData(3.0),
+    }
+    fetched_ids = [c.args[0] for c in make_request.await_args_list]
+    assert sorted(fetched_ids) == [1, 2, 3]
+
+
+def test_get_if_account_is_reachable(app, db_session, caplog, current_ts):
     from swpt_accounts import procedures as p
 
     app_fetch_api_url = current_app.config["FETCH_API_URL"]
-    current_ts = datetime.now(tz=timezone.utc)
     p.configure_account(D_ID, C_ID, current_ts, 0)
     assert get_if_account_is_reachable(D_ID, C_ID)
     assert not get_if_account_is_reachable(666, C_ID)
@@ -118,13 +119,10 @@ def test_get_if_account_is_reachable(app, db_session, caplog):
     current_app.config["FETCH_API_URL"] = app_fetch_api_url
 
 
-def test_get_root_account_config_data(app, db_session, caplog):
+def test_get_root_account_config_data(app, db_session, caplog, current_ts):
     from swpt_accounts import procedures as p
-    from swpt_accounts.fetch_api_client import _clear_root_config_data
 
     app_fetch_api_url = current_app.config["FETCH_API_URL"]
-
-    current_ts = datetime.now(tz=timezone.utc)
     p.configure_account(
         D_ID, p.ROOT_CREDITOR_ID, current_ts, 0, config_data='{"rate": 2.0}'
     )
@@ -149,5 +147,3 @@ def test_get_root_account_config_data(app, db_session, caplog):
             777: None,
         }
         assert len(caplog.records) == 0
-
-    _clear_root_config_data()
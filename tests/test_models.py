@@ -1,13 +1,35 @@
-from datetime import datetime, date, timezone, timedelta
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from swpt_pythonlib.utils import ShardingRealm
+from swpt_accounts import models as m
 from swpt_accounts.models import Account
+from swpt_accounts.extensions import (
+    TO_COORDINATORS_EXCHANGE,
+    TO_DEBTORS_EXCHANGE,
+    TO_CREDITORS_EXCHANGE,
+    ACCOUNTS_IN_EXCHANGE,
+)
 
 D_ID = -1
 C_ID = 1
+TS = datetime(2020, 1, 1, tzinfo=timezone.utc)
 
 
-def test_sibnalbus_burst_count(app):
-    from swpt_accounts import models as m
+@pytest.fixture
+def rejected_transfer_signal(current_ts):
+    return m.RejectedTransferSignal(
+        debtor_id=1,
+        sender_creditor_id=2,
+        coordinator_type="direct",
+        coordinator_id=666,
+        coordinator_request_id=777,
+        status_code="TEST_ERROR",
+        total_locked_amount=0,
+        inserted_at=current_ts,
+    )
+
 
+def test_sibnalbus_burst_count(app):
     assert isinstance(m.RejectedTransferSignal.signalbus_burst_count, int)
     assert isinstance(m.PreparedTransferSignal.signalbus_burst_count, int)
     assert isinstance(m.FinalizedTransferSignal.signalbus_burst_count, int)
@@ -18,21 +40,11 @@ def test_sibnalbus_burst_count(app):
     assert isinstance(m.PendingBalanceChangeSignal.signalbus_burst_count, int)
 
 
-def test_send_signalbus_message(app, mocker):
-    from swpt_accounts import models as m
-
-    current_ts = datetime.now()
+def test_send_signalbus_message(
+    app, mocker, current_ts, rejected_transfer_signal
+):
     publisher = mocker.patch("swpt_accounts.models.publisher")
-    s = m.RejectedTransferSignal(
-        debtor_id=1,
-        sender_creditor_id=2,
-        coordinator_type="direct",
-        coordinator_id=666,
-        coordinator_request_id=777,
-        status_code="TEST_ERROR",
-        total_locked_amount=0,
-        inserted_at=current_ts,
-    )
+    s = rejected_transfer_signal
     s.send_signalbus_message()
     publisher.publish_messages.assert_called_once()
     args, kwargs = publisher.publish_messages.call_args
@@ -83,25 +95,13 @@ def test_send_signalbus_message(app, mocker):
     ).send_signalbus_message()
 
 
-def test_send_signalbus_message_wrong_shard(app, mocker):
-    from swpt_accounts import models as m
-    from swpt_pythonlib.utils import ShardingRealm
-
-    orig_sharding_realm = app.config["SHARDING_REALM"]
-    app.config["SHARDING_REALM"] = ShardingRealm("0.#")
-    app.config["DELETE_PARENT_SHARD_RECORDS"] = True
-    current_ts = datetime.now()
+def test_send_signalbus_message_wrong_shard(
+    app, mocker, monkeypatch, rejected_transfer_signal
+):
+    monkeypatch.setitem(app.config, "SHARDING_REALM", ShardingRealm("0.#"))
+    monkeypatch.setitem(app.config, "DELETE_PARENT_SHARD_RECORDS", True)
     publisher = mocker.patch("swpt_accounts.models.publisher")
-    s = m.RejectedTransferSignal(
-        debtor_id=1,
-        sender_creditor_id=2,
-        coordinator_type="direct",
-        coordinator_id=666,
-        coordinator_request_id=777,
-        status_code="TEST_ERROR",
-        total_locked_amount=0,
-        inserted_at=current_ts,
-    )
+    s = rejected_transfer_signal
     s.send_signalbus_message()
     publisher.publish_messages.assert_called_once()
     args, kwargs = publisher.publish_messages.call_args
@@ -109,19 +109,9 @@ def test_send_signalbus_message_wrong_shard(app, mocker):
     assert kwargs == {}
     messages = args[0]
     assert len(messages) == 0
-    app.config["DELETE_PARENT_SHARD_RECORDS"] = False
-    app.config["SHARDING_REALM"] = orig_sharding_realm
 
 
 def test_properties(app):
-    from swpt_accounts import models as m
-    from swpt_accounts.extensions import (
-        TO_COORDINATORS_EXCHANGE,
-        TO_DEBTORS_EXCHANGE,
-        TO_CREDITORS_EXCHANGE,
-        ACCOUNTS_IN_EXCHANGE,
-    )
-
     s = m.RejectedTransferSignal(coordinator_id=1)
     assert s.exchange_name == TO_COORDINATORS_EXCHANGE
     assert s.routing_key == "00.00.00.00.00.00.00.01"
@@ -165,8 +155,7 @@ def test_properties(app):
 
 def test_configure_account():
     one_year = timedelta(days=365.25)
-    current_ts = datetime.now(tz=timezone.utc)
-    committed_at = current_ts - 2 * one_year
+    committed_at = TS - 2 * one_year
     account = Account(
         debtor_id=D_ID,
         creditor_id=C_ID,
@@ -176,23 +165,23 @@ def test_configure_account():
         pending_transfers_count=0,
         last_transfer_id=0,
         status_flags=0,
-        last_change_ts=current_ts,
+        last_change_ts=TS,
         previous_interest_rate=0.0,
-        last_interest_rate_change_ts=current_ts - one_year,
+        last_interest_rate_change_ts=TS - one_year,
         interest_rate=10.0,
     )
-    i = account.calc_due_interest(1000, committed_at, current_ts)
+    i = account.calc_due_interest(1000, committed_at, TS)
     assert abs(i - 100) < 1e-12
 
-    i = account.calc_due_interest(-1000, committed_at, current_ts)
+    i = account.calc_due_interest(-1000, committed_at, TS)
     assert abs(i + 100) < 1e-12
 
     assert account.calc_due_interest(1000, committed_at, committed_at) == 0
-    assert account.calc_due_interest(1000, current_ts, current_ts) == 0
-    assert account.calc_due_interest(1000, current_ts, committed_at) == 0
+    assert account.calc_due_interest(1000, TS, TS) == 0
+    assert account.calc_due_interest(1000, TS, committed_at) == 0
 
     i = account.calc_due_interest(
-        1000, current_ts - timedelta(days=1), current_ts
+        1000, TS - timedelta(days=1), TS
     )
     assert abs(i - 0.26098) < 1e-3
 
@@ -203,8 +192,6 @@ def test_configure_account():
 
 
 def test_are_managed_by_same_agent(app):
-    from swpt_accounts import models as m
-
     assert m.are_managed_by_same_agent(0x0000010000000001, 0x0000010000000002)
     assert m.are_managed_by_same_agent(-1, -1)
     assert m.are_managed_by_same_agent(-1, -2)
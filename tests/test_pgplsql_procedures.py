@@ -1,18 +1,186 @@
 import pytest
+from typing import NamedTuple
 from datetime import datetime, timedelta, timezone, date
-from sqlalchemy import text
+from sqlalchemy import insert, select, text
 from swpt_pythonlib.utils import date_to_int24
 from swpt_accounts import models
+from swpt_accounts.extensions import db
 from swpt_accounts import procedures as p
 
 
-@pytest.fixture(scope="function")
-def current_ts():
-    return datetime.now(tz=timezone.utc)
-
-
 D_ID = -1
 C_ID = 1
+TS = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+CALC_K_RATES = [0.0, 10.0, 100.0, -5.0, -99.9]
+
+CONTAIN_PRINCIPAL_OVERFLOW_VALUES = [
+    0,
+    10,
+    9223372036854775807,
+    9223372036854775808,
+    99999999999999999999999,
+    -10,
+    -9223372036854775807,
+    -9223372036854775808,
+    -99999999999999999999999,
+]
+
+CALC_CURRENT_BALANCE_CASES = {
+    "zero": (C_ID, 0, 0.0, 0.0, TS, TS),
+    "no-time-passed": (C_ID, 1_000_000, 0.0, 0.0, TS, TS),
+    "zero-rate": (C_ID, 1_000_000, 0.0, 0.0, TS - timedelta(days=365), TS),
+    "positive-rate": (
+        C_ID, 1_000_000, 0.0, 10.0, TS - timedelta(days=365), TS
+    ),
+    "negative-rate": (
+        C_ID, 1_000_000, 0.0, -10.0, TS - timedelta(days=365), TS
+    ),
+    "negative-rate-backwards": (
+        C_ID, 1_000_000, 0.0, -10.0, TS, TS - timedelta(days=365)
+    ),
+    "positive-rate-backwards": (
+        C_ID, 1_000_000, 0.0, 10.0, TS, TS - timedelta(days=365)
+    ),
+    "root-positive-rate": (
+        0, 0, 1_000_000, 10.0, TS - timedelta(days=365), TS
+    ),
+    "root-negative-rate": (
+        0, 0, 1_000_000, -10.0, TS - timedelta(days=365), TS
+    ),
+    "positive-interest-positive-rate": (
+        C_ID, 1_000_000, 1e6, 10.0, TS - timedelta(days=365), TS
+    ),
+    "positive-interest-negative-rate": (
+        C_ID, 1_000_000, 1e6, -10.0, TS - timedelta(days=365), TS
+    ),
+    "negative-interest-positive-rate": (
+        C_ID, 1_000_000, -1e6, 10.0, TS - timedelta(days=365), TS
+    ),
+    "negative-interest-negative-rate": (
+        C_ID, 1_000_000, -1e6, -10.0, TS - timedelta(days=365), TS
+    ),
+    "negative-interest-positive-rate-1000-years": (
+        C_ID, 1_000_000, -1e6, 10.0, TS - timedelta(days=365000), TS
+    ),
+    "negative-interest-negative-rate-1000-years": (
+        C_ID, 1_000_000, -1e6, -10.0, TS - timedelta(days=365000), TS
+    ),
+}
+
+
+class StatusCodeCase(NamedTuple):
+    committed_amount: int
+    expendable_amount: int
+    last_interest_rate_change_delta: timedelta
+    current_ts_delta: timedelta
+    is_ok: bool
+    sender_creditor_id: int = C_ID
+    recipient_creditor_id: int = 1
+
+
+CALC_STATUS_CODE_CASES = {
+    "newer-interest-rate": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=0,
+        last_interest_rate_change_delta=timedelta(minutes=1),
+        current_ts_delta=timedelta(0),
+        is_ok=False,
+    ),
+    "at-prepared-at": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=0,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(0),
+        is_ok=True,
+    ),
+    "past-deadline": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=0,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=20000),
+        is_ok=False,
+    ),
+    "before-prepared-at": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=0,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=-10),
+        is_ok=True,
+    ),
+    "after-10-days": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=0,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=10),
+        is_ok=True,
+    ),
+    "negative-expendable-at-prepared-at": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=-1,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(0),
+        is_ok=True,
+    ),
+    "negative-expendable-after-1-second": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=-1,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(seconds=1),
+        is_ok=False,
+    ),
+    "negative-expendable-before-prepared-at": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=-1,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=-10),
+        is_ok=True,
+    ),
+    "demurrage-not-covered": StatusCodeCase(
+        committed_amount=999,
+        expendable_amount=-5,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=10),
+        is_ok=False,
+    ),
+    "demurrage-covered": StatusCodeCase(
+        committed_amount=995,
+        expendable_amount=-5,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=10),
+        is_ok=True,
+    ),
+    "above-demurrage-locked-amount": StatusCodeCase(
+        committed_amount=995,
+        expendable_amount=-50000,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=10),
+        is_ok=False,
+    ),
+    "within-demurrage-locked-amount": StatusCodeCase(
+        committed_amount=980,
+        expendable_amount=-50000,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=10),
+        is_ok=True,
+    ),
+    "recipient-is-root": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=-50000,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=10),
+        is_ok=False,
+        recipient_creditor_id=0,
+    ),
+    "sender-is-root": StatusCodeCase(
+        committed_amount=1000,
+        expendable_amount=-50000,
+        last_interest_rate_change_delta=timedelta(0),
+        current_ts_delta=timedelta(days=10),
+        is_ok=True,
+        sender_creditor_id=0,
+    ),
+}
 
 ACCOUNT_DATA_FIELDS = """
     creditor_id,
@@ -37,158 +205,263 @@ ACCOUNT_DATA_FIELDS = """
     pending_account_update
 """
 
+ACCOUNT_DATA = (
+    "SELECT a::account_data"
+    f" FROM (SELECT {ACCOUNT_DATA_FIELDS} FROM account) a"
+)
+
+CALC_K = text(
+    "SELECT t.n, calc_k(t.rate) FROM unnest(CAST(:rates AS FLOAT[]))"
+    " WITH ORDINALITY AS t(rate, n)"
+)
+
+CONTAIN_PRINCIPAL_OVERFLOW = text(
+    "SELECT t.n, contain_principal_overflow(t.value)"
+    " FROM unnest(CAST(:values AS NUMERIC(24)[]))"
+    " WITH ORDINALITY AS t(value, n)"
+)
+
+CALC_CURRENT_BALANCE = text(
+    "SELECT t.n, calc_current_balance("
+    "t.creditor_id, t.principal, t.interest, t.interest_rate,"
+    " t.last_change_ts, t.current_ts) "
+    "FROM unnest("
+    "CAST(:creditor_ids AS BIGINT[]),"
+    " CAST(:principals AS BIGINT[]),"
+    " CAST(:interests AS FLOAT[]),"
+    " CAST(:interest_rates AS FLOAT[]),"
+    " CAST(:last_change_tss AS TIMESTAMP WITH TIME ZONE[]),"
+    " CAST(:current_tss AS TIMESTAMP WITH TIME ZONE[])"
+    ") WITH ORDINALITY AS t("
+    "creditor_id, principal, interest, interest_rate,"
+    " last_change_ts, current_ts, n)"
+)
+
+SELECT_ACCOUNT = text(
+    "SELECT"
+    " creditor_id, debtor_id, principal, interest, status_flags,"
+    " last_change_seqnum, last_change_ts, pending_account_update"
+    " FROM account WHERE debtor_id = :did AND creditor_id = :cid"
+)
+
+LOCK_ACCOUNT = text("SELECT * FROM lock_account(:did, :cid)")
+
+LOCK_OR_CREATE_ACCOUNT = text(
+    "SELECT * FROM lock_or_create_account(:did, :cid, :current_ts)"
+)
+
+CREATE_ACCOUNTS = text(
+    "SELECT lock_or_create_account(:did, t.cid, :current_ts)"
+    " FROM unnest(CAST(:cids AS BIGINT[])) AS t(cid)"
+)
+
+CALC_STATUS_CODE = text(
+    "SELECT t.n, calc_status_code("
+    "pt, t.committed_amount, t.expendable_amount,"
+    " t.last_interest_rate_change_ts, t.current_ts) "
+    "FROM unnest("
+    "CAST(:transfer_ids AS BIGINT[]),"
+    " CAST(:committed_amounts AS BIGINT[]),"
+    " CAST(:expendable_amounts AS NUMERIC(24)[]),"
+    " CAST(:last_interest_rate_change_tss AS TIMESTAMP WITH TIME ZONE[]),"
+    " CAST(:current_tss AS TIMESTAMP WITH TIME ZONE[])"
+    ") WITH ORDINALITY AS t("
+    "transfer_id, committed_amount, expendable_amount,"
+    " last_interest_rate_change_ts, current_ts, n) "
+    "JOIN prepared_transfer pt"
+    " ON pt.debtor_id = :debtor_id AND pt.transfer_id = t.transfer_id"
+)
+
+APPLY_ACCOUNT_CHANGE = text(
+    "SELECT * FROM apply_account_change("
+    f"({ACCOUNT_DATA}),"
+    " :principal_delta,"
+    " :interest_delta,"
+    " :current_ts"
+    ")"
+)
+
+PROCESS_FINALIZATION_REQUESTS = text(
+    "SELECT process_finalization_requests("
+    " :debtor_id, :sender_creditor_id, :ignore_all)"
+)
+
+CALC_DUE_INTEREST = text(
+    "SELECT * FROM calc_due_interest("
+    f"({ACCOUNT_DATA}),"
+    " :amount,"
+    " :due_ts,"
+    " :current_ts"
+    ")"
+)
+
+
+def _get_account_update_signals(db_session):
+    return db_session.execute(
+        select(models.AccountUpdateSignal)
+        .order_by(models.AccountUpdateSignal.inserted_at)
+    ).scalars().all()
+
+
+def _create_accounts(db_session, creditor_ids, current_ts):
+    db_session.execute(
+        CREATE_ACCOUNTS,
+        {"did": D_ID, "cids": creditor_ids, "current_ts": current_ts},
+    )
 
-def test_calc_k(db_session):
-    for rate in [0.0, 10.0, 100.0, -5.0, -99.9]:
-        calc_k = (
-            db_session.execute(
-                text("SELECT calc_k(:interest_rate)"), {"interest_rate": rate}
-            )
-        ).scalar()
-        assert calc_k == models.calc_k(rate)
-
-
-def test_contain_principal_overflow(db_session):
-    for n in [
-            0,
-            10,
-            9223372036854775807,
-            9223372036854775808,
-            99999999999999999999999,
-            -10,
-            -9223372036854775807,
-            -9223372036854775808,
-            -99999999999999999999999,
-    ]:
-        contained_principal = (
-            db_session.execute(
-                text("SELECT contain_principal_overflow(:n)"), {"n": n}
-            )
-        ).scalar()
-        assert contained_principal == models.contain_principal_overflow(n)
-
-
-def test_calc_current_balance(db_session):
-    ts = datetime.now(tz=timezone.utc)
-    for (
-            creditor_id,
-            principal,
-            interest,
-            interest_rate,
-            last_change_ts,
-            current_ts,
-    ) in [
-            (C_ID, 0, 0.0, 0.0, ts, ts),
-            (C_ID, 1_000_000, 0.0, 0.0, ts, ts),
-            (C_ID, 1_000_000, 0.0, 0.0, ts - timedelta(days=365), ts),
-            (C_ID, 1_000_000, 0.0, 10.0, ts - timedelta(days=365), ts),
-            (C_ID, 1_000_000, 0.0, -10.0, ts - timedelta(days=365), ts),
-            (C_ID, 1_000_000, 0.0, -10.0, ts, ts - timedelta(days=365)),
-            (C_ID, 1_000_000, 0.0, 10.0, ts, ts - timedelta(days=365)),
-            (0, 0, 1_000_000, 10.0, ts - timedelta(days=365), ts),
-            (0, 0, 1_000_000, -10.0, ts - timedelta(days=365), ts),
-            (C_ID, 1_000_000, 1e6, 10.0, ts - timedelta(days=365), ts),
-            (C_ID, 1_000_000, 1e6, -10.0, ts - timedelta(days=365), ts),
-            (C_ID, 1_000_000, -1e6, 10.0, ts - timedelta(days=365), ts),
-            (C_ID, 1_000_000, -1e6, -10.0, ts - timedelta(days=365), ts),
-            (C_ID, 1_000_000, -1e6, 10.0, ts - timedelta(days=365000), ts),
-            (C_ID, 1_000_000, -1e6, -10.0, ts - timedelta(days=365000), ts),
-    ]:
-        calc_current_balance = (
-            db_session.execute(
-                text(
-                    "SELECT calc_current_balance(:creditor_id, :principal,"
-                    " :interest, :interest_rate, :last_change_ts, :current_ts)"
-                ),
-                {
-                    "creditor_id": creditor_id,
-                    "principal": principal,
-                    "interest": interest,
-                    "interest_rate": interest_rate,
-                    "last_change_ts": last_change_ts,
-                    "current_ts": current_ts
-                },
-            )
-        ).scalar()
-        assert abs(
-            calc_current_balance - models.calc_current_balance(
-                creditor_id=creditor_id,
-                principal=principal,
-                interest=interest,
-                interest_rate=interest_rate,
-                last_change_ts=last_change_ts,
-                current_ts=current_ts,
-            )
-        ) < 5e-8
 
+def _by_input(inputs, rows):
+    # Maps each input to its result. Each row must contain the 1-based
+    # position of the input, followed by the result.
+    return {inputs[n - 1]: result for n, result in rows}
 
-def test_lock_account(db_session, current_ts):
-    p.configure_account(D_ID, C_ID, current_ts, 0)
 
-    account = (
-        db_session.execute(
-            text("SELECT * FROM lock_account(:did, :cid)"),
-            {"did": D_ID, "cid": C_ID},
-        )
-        .mappings()
-        .one_or_none()
+@pytest.fixture(scope="module")
+def calc_ks(app):
+    with db.engine.connect() as connection:
+        rows = connection.execute(CALC_K, {"rates": CALC_K_RATES}).all()
+
+    return _by_input(CALC_K_RATES, rows)
+
+
+@pytest.mark.parametrize("rate", CALC_K_RATES)
+def test_calc_k(calc_ks, rate):
+    assert rate in calc_ks
+    assert calc_ks[rate] == models.calc_k(rate)
+
+
+@pytest.fixture(scope="module")
+def contained_principals(app):
+    with db.engine.connect() as connection:
+        rows = connection.execute(
+            CONTAIN_PRINCIPAL_OVERFLOW,
+            {"values": CONTAIN_PRINCIPAL_OVERFLOW_VALUES},
+        ).all()
+
+    return _by_input(CONTAIN_PRINCIPAL_OVERFLOW_VALUES, rows)
+
+
+@pytest.fixture(scope="module")
+def current_balances(app):
+    cases = list(CALC_CURRENT_BALANCE_CASES.values())
+    (
+        creditor_ids,
+        principals,
+        interests,
+        interest_rates,
+        last_change_tss,
+        current_tss,
+    ) = zip(*cases)
+    with db.engine.connect() as connection:
+        rows = connection.execute(
+            CALC_CURRENT_BALANCE,
+            {
+                "creditor_ids": list(creditor_ids),
+                "principals": list(principals),
+                "interests": [float(x) for x in interests],
+                "interest_rates": list(interest_rates),
+                "last_change_tss": list(last_change_tss),
+                "current_tss": list(current_tss),
+            },
+        ).all()
+
+    return _by_input(cases, rows)
+
+
+@pytest.mark.parametrize("value", CONTAIN_PRINCIPAL_OVERFLOW_VALUES)
+def test_contain_principal_overflow(contained_principals, value):
+    assert value in contained_principals
+    assert contained_principals[value] == (
+        models.contain_principal_overflow(value)
     )
-    assert account
-    assert account["creditor_id"] == C_ID
-    assert account["debtor_id"] == D_ID
 
-    account = (
-        db_session.execute(
-            text("SELECT * FROM lock_account(:did, :cid)"),
-            {"did": 1234, "cid": 5678},
+
+@pytest.mark.parametrize(
+    "creditor_id, principal, interest, interest_rate,"
+    " last_change_ts, current_ts",
+    list(CALC_CURRENT_BALANCE_CASES.values()),
+    ids=list(CALC_CURRENT_BALANCE_CASES),
+)
+def test_calc_current_balance(
+    current_balances,
+    creditor_id,
+    principal,
+    interest,
+    interest_rate,
+    last_change_ts,
+    current_ts,
+):
+    case = (
+        creditor_id,
+        principal,
+        interest,
+        interest_rate,
+        last_change_ts,
+        current_ts,
+    )
+    assert case in current_balances
+    assert abs(
+        current_balances[case] - models.calc_current_balance(
+            creditor_id=creditor_id,
+            principal=principal,
+            interest=interest,
+            interest_rate=interest_rate,
+            last_change_ts=last_change_ts,
+            current_ts=current_ts,
         )
-        .mappings()
-        .one_or_none()
-    )
+    ) < 5e-8
+
+
+@pytest.fixture
+def configured_account(db_session, current_ts):
+    """Configure the (D_ID, C_ID) account."""
+
+    p.configure_account(D_ID, C_ID, current_ts, 0)
+
+
+@pytest.mark.usefixtures("configured_account")
+def test_lock_account(db_session):
+    account = db_session.execute(
+        LOCK_ACCOUNT, {"did": D_ID, "cid": C_ID}
+    ).one()
+    assert account.creditor_id == C_ID
+    assert account.debtor_id == D_ID
+
+    account = db_session.execute(
+        LOCK_ACCOUNT, {"did": 1234, "cid": 5678}
+    ).one_or_none()
     assert account
-    for k, v in account.items():
-        assert v is None
+    assert all(v is None for v in account)
 
     # Mark the account as "deleted".
-    models.Account.query.update({"status_flags": 0b10001})
-    account = (
-        db_session.execute(
-            text("SELECT * FROM lock_account(:did, :cid)"),
-            {"did": D_ID, "cid": C_ID},
-        )
-        .mappings()
-        .one_or_none()
-    )
+    models.Account.query.filter_by(
+        debtor_id=D_ID, creditor_id=C_ID
+    ).update({"status_flags": 0b10001}, synchronize_session=False)
+    account = db_session.execute(
+        LOCK_ACCOUNT, {"did": D_ID, "cid": C_ID}
+    ).one_or_none()
     assert account
-    for k, v in account.items():
-        assert v is None
+    assert all(v is None for v in account)
 
 
 def test_lock_or_create_account(db_session, current_ts):
-    account = (
-        db_session.execute(
-            text(
-                "SELECT * FROM lock_or_create_account("
-                ":did, :cid, :current_ts)"
-            ),
-            {"did": D_ID, "cid": C_ID, "current_ts": current_ts},
-        )
-        .mappings()
-        .one_or_none()
-    )
-    assert account
-    assert account["creditor_id"] == C_ID
-    assert account["debtor_id"] == D_ID
-    assert account["creation_date"] == current_ts.date()
-    assert account["last_change_ts"] == current_ts
-    assert account["last_interest_rate_change_ts"] == models.T0
-    assert account["last_transfer_id"] == (
-        date_to_int24(account["creation_date"]) << 40
-    )
-    last_change_seqnum = account["last_change_seqnum"]
+    last_transfer_id = date_to_int24(current_ts.date()) << 40
+    account = db_session.execute(
+        LOCK_OR_CREATE_ACCOUNT,
+        {"did": D_ID, "cid": C_ID, "current_ts": current_ts},
+    ).one()
+    assert account.creditor_id == C_ID
+    assert account.debtor_id == D_ID
+    assert account.creation_date == current_ts.date()
+    assert account.last_change_ts == current_ts
+    assert account.last_interest_rate_change_ts == models.T0
+    assert account.last_transfer_id == last_transfer_id
+    last_change_seqnum = account.last_change_seqnum
     assert isinstance(last_change_seqnum, int)
 
-    aus = models.AccountUpdateSignal.query.one()
+    signals = _get_account_update_signals(db_session)
+    assert len(signals) == 1
+    aus = signals[0]
     assert aus.debtor_id == account.debtor_id
     assert aus.creditor_id == account.creditor_id
     assert aus.last_change_seqnum == account.last_change_seqnum
@@ -207,67 +480,50 @@ def test_lock_or_create_account(db_session, current_ts):
     assert aus.config_data == account.config_data
     assert aus.inserted_at == account.last_change_ts
 
-    account = (
-        db_session.execute(
-            text(
-                "SELECT * FROM lock_or_create_account("
-                ":did, :cid, :current_ts)"
-            ),
-            {"did": D_ID, "cid": C_ID, "current_ts": current_ts},
-        )
-        .mappings()
-        .one_or_none()
-    )
-    assert account
-    assert account["creditor_id"] == C_ID
-    assert account["debtor_id"] == D_ID
-    assert account["creation_date"] == current_ts.date()
-    assert account["last_change_ts"] == current_ts
-    assert account["last_interest_rate_change_ts"] == models.T0
-    assert account["last_transfer_id"] == (
-        date_to_int24(account["creation_date"]) << 40
-    )
-    assert len(models.AccountUpdateSignal.query.all()) == 1
-
-    models.Account.query.update(
+    account = db_session.execute(
+        LOCK_OR_CREATE_ACCOUNT,
+        {"did": D_ID, "cid": C_ID, "current_ts": current_ts},
+    ).one()
+    assert account.creditor_id == C_ID
+    assert account.debtor_id == D_ID
+    assert account.creation_date == current_ts.date()
+    assert account.last_change_ts == current_ts
+    assert account.last_interest_rate_change_ts == models.T0
+    assert account.last_transfer_id == last_transfer_id
+    assert models.AccountUpdateSignal.query.count() == 1
+
+    models.Account.query.filter_by(
+        debtor_id=D_ID, creditor_id=C_ID
+    ).update(
         {
             "status_flags": 0b1,
             "pending_account_update": True,
-        }
-    )
-    account = (
-        db_session.execute(
-            text(
-                "SELECT * FROM lock_or_create_account("
-                ":did, :cid, :current_ts)"
-            ),
-            {
-                "did": D_ID,
-                "cid": C_ID,
-                "current_ts": current_ts + timedelta(days=1),
-            },
-        )
-        .mappings()
-        .one_or_none()
+        },
+        synchronize_session=False,
     )
-    assert len(models.AccountUpdateSignal.query.all()) == 2
-    assert account
-    assert account["creditor_id"] == C_ID
-    assert account["debtor_id"] == D_ID
-    assert account["pending_account_update"] is False
-    assert account["status_flags"] == 0
-    assert account["last_change_ts"] == current_ts + timedelta(days=1)
-    assert account["last_change_seqnum"] == last_change_seqnum + 1
-
-
+    account = db_session.execute(
+        LOCK_OR_CREATE_ACCOUNT,
+        {
+            "did": D_ID,
+            "cid": C_ID,
+            "current_ts": current_ts + timedelta(days=1),
+        },
+    ).one()
+    signals = _get_account_update_signals(db_session)
+    assert len(signals) == 2
+    assert signals[1].last_change_ts == current_ts + timedelta(days=1)
+    assert account.creditor_id == C_ID
+    assert account.debtor_id == D_ID
+    assert account.pending_account_update is False
+    assert account.status_flags == 0
+    assert account.last_change_ts == current_ts + timedelta(days=1)
+    assert account.last_change_seqnum == last_change_seqnum + 1
+
+
+@pytest.mark.usefixtures("configured_account")
 @pytest.mark.parametrize("overflow", [True, False])
 def test_apply_account_change(db_session, current_ts, overflow):
-    p.configure_account(D_ID, C_ID, current_ts, 0)
-    acc = (
-        models.Account.query
-        .filter_by(debtor_id=D_ID, creditor_id=C_ID)
-        .one()
-    )
+    acc = db_session.get(models.Account, (D_ID, C_ID))
     assert acc
     last_change_seqnum = acc.last_change_seqnum
     last_change_ts = acc.last_change_ts
@@ -276,198 +532,128 @@ def test_apply_account_change(db_session, current_ts, overflow):
     if overflow:
         acc.principal = models.MAX_INT64 - 999
         acc.last_change_seqnum = 0x7fffffff
-    db_session.commit()
+    db_session.flush()
 
-    account = (
-        db_session.execute(
-            text(
-                "SELECT * FROM apply_account_change("
-                "("
-                "  SELECT a::account_data "
-                f" FROM (SELECT {ACCOUNT_DATA_FIELDS} FROM account) a"
-                "),"
-                " :principal_delta,"
-                " :interest_delta,"
-                " :current_ts"
-                ")"
-            ),
-            {
-                "principal_delta": 1000,
-                "interest_delta": 100.0,
-                "current_ts": current_ts,
-            },
-        )
-        .mappings()
-        .one_or_none()
-    )
-    db_session.commit()
-    acc = (
-        models.Account.query
-        .filter_by(debtor_id=D_ID, creditor_id=C_ID)
-        .one()
-    )
-    assert acc
+    account = db_session.execute(
+        APPLY_ACCOUNT_CHANGE,
+        {
+            "principal_delta": 1000,
+            "interest_delta": 100.0,
+            "current_ts": current_ts,
+        },
+    ).one()
+    acc = db_session.execute(
+        SELECT_ACCOUNT, {"did": D_ID, "cid": C_ID}
+    ).one()
 
-    assert account
-    assert account["creditor_id"] == C_ID == acc.creditor_id
-    assert account["debtor_id"] == D_ID == acc.debtor_id
+    assert account.creditor_id == C_ID == acc.creditor_id
+    assert account.debtor_id == D_ID == acc.debtor_id
 
     if overflow:
         ovrf = models.Account.STATUS_OVERFLOWN_FLAG
-        assert account["principal"] == 0x7fffffffffffffff == acc.principal
-        assert account["status_flags"] == flags | ovrf == acc.status_flags
+        assert account.principal == 0x7fffffffffffffff == acc.principal
+        assert account.status_flags == flags | ovrf == acc.status_flags
         assert (
-            account["last_change_seqnum"]
+            account.last_change_seqnum
             == -0x80000000
             == acc.last_change_seqnum
         )
     else:
-        assert account["principal"] == 1000 == acc.principal
-        assert account["status_flags"] == flags == acc.status_flags
+        assert account.principal == 1000 == acc.principal
+        assert account.status_flags == flags == acc.status_flags
         assert (
-            account["last_change_seqnum"]
+            account.last_change_seqnum
             == last_change_seqnum + 1
             == acc.last_change_seqnum
         )
 
-    assert account["interest"] == 100.0 == acc.interest
+    assert account.interest == 100.0 == acc.interest
     assert (
-        account["pending_account_update"]
+        account.pending_account_update
         == bool(True)
         == acc.pending_account_update
     )
     assert (
-        account["last_change_ts"]
+        account.last_change_ts
         == max(last_change_ts, current_ts)
         == acc.last_change_ts
     )
 
 
-def test_calc_status_code_sp(db_session, current_ts):
-    from swpt_accounts.models import SC_OK
-
-    def calc_status_code(
-        committed_amount: int,
-        expendable_amount: int,
-        last_interest_rate_change_ts: datetime,
-        current_ts: datetime,
-    ) -> str:
-        return (
-            db_session.execute(
-                text(
-                    "SELECT calc_status_code("
-                    " (SELECT p FROM prepared_transfer p),"
-                    " :committed_amount,"
-                    " :expendable_amount,"
-                    " :last_interest_rate_change_ts,"
-                    " :current_ts"
-                    ")"
-                ),
-                {
-                    "committed_amount": committed_amount,
-                    "expendable_amount": expendable_amount,
-                    "last_interest_rate_change_ts": (
-                        last_interest_rate_change_ts
-                    ),
-                    "current_ts": current_ts,
-                },
+@pytest.fixture(scope="module")
+def status_codes(app):
+    cases = list(CALC_STATUS_CODE_CASES.values())
+
+    # Prepares one transfer for each distinct (sender, recipient) pair.
+    transfer_ids = {}
+    prepared_transfers = []
+    for case in cases:
+        pair = (case.sender_creditor_id, case.recipient_creditor_id)
+        if pair in transfer_ids:
+            continue
+        transfer_ids[pair] = len(transfer_ids) + 1
+        prepared_transfers.append(
+            dict(
+                debtor_id=D_ID,
+                sender_creditor_id=case.sender_creditor_id,
+                transfer_id=transfer_ids[pair],
+                coordinator_type="test",
+                coordinator_id=11,
+                coordinator_request_id=22,
+                recipient_creditor_id=case.recipient_creditor_id,
+                prepared_at=TS,
+                final_interest_rate_ts=TS,
+                demurrage_rate=-50,
+                deadline=TS + timedelta(days=10000),
+                locked_amount=1000,
             )
-            .scalar()
         )
 
-    p.configure_account(D_ID, C_ID, current_ts, 0)
-    p.configure_account(D_ID, 0, current_ts, 0)
-    pt = models.PreparedTransfer(
-        debtor_id=D_ID,
-        sender_creditor_id=C_ID,
-        transfer_id=1,
-        coordinator_type="test",
-        coordinator_id=11,
-        coordinator_request_id=22,
-        recipient_creditor_id=1,
-        prepared_at=current_ts,
-        final_interest_rate_ts=current_ts,
-        demurrage_rate=-50,
-        deadline=current_ts + timedelta(days=10000),
-        locked_amount=1000,
-    )
-    db_session.add(pt)
-    db_session.commit()
+    # The accounts and the prepared transfers are rolled back, so that
+    # they do not leak into other tests.
+    with db.engine.connect() as connection:
+        _create_accounts(connection, [C_ID, 0], TS)
+        connection.execute(insert(models.PreparedTransfer), prepared_transfers)
+        rows = connection.execute(
+            CALC_STATUS_CODE,
+            {
+                "debtor_id": D_ID,
+                "transfer_ids": [
+                    transfer_ids[
+                        (case.sender_creditor_id, case.recipient_creditor_id)
+                    ]
+                    for case in cases
+                ],
+                "committed_amounts": [
+                    case.committed_amount for case in cases
+                ],
+                "expendable_amounts": [
+                    case.expendable_amount for case in cases
+                ],
+                "last_interest_rate_change_tss": [
+                    TS + case.last_interest_rate_change_delta
+                    for case in cases
+                ],
+                "current_tss": [TS + case.current_ts_delta for case in cases],
+            },
+        ).all()
+        connection.rollback()
+
+    return _by_input(cases, rows)
 
-    assert (
-        calc_status_code(
-            1000, 0, current_ts + timedelta(minutes=1), current_ts
-        ) != SC_OK
-    )
-    assert calc_status_code(1000, 0, current_ts, current_ts) == SC_OK
-    assert (
-        calc_status_code(
-            1000, 0, current_ts, current_ts + timedelta(days=20000)
-        )
-    ) != SC_OK
-    assert (
-        calc_status_code(
-            1000, 0, current_ts, current_ts - timedelta(days=10)
-        ) == SC_OK
-    )
-    assert (
-        calc_status_code(
-            1000, 0, current_ts, current_ts + timedelta(days=10)
-        )
-        == SC_OK
-    )
-    assert (
-        calc_status_code(1000, -1, current_ts, current_ts) == SC_OK
-    )
-    assert (
-        calc_status_code(
-            1000, -1, current_ts, current_ts + timedelta(seconds=1)
-        ) != SC_OK
-    )
-    assert (
-        calc_status_code(
-            1000, -1, current_ts, current_ts - timedelta(days=10)
-        ) == SC_OK
-    )
-    assert (
-        calc_status_code(
-            999, -5, current_ts, current_ts + timedelta(days=10)
-        ) != SC_OK
-    )
-    assert (
-        calc_status_code(
-            995, -5, current_ts, current_ts + timedelta(days=10)
-        ) == SC_OK
-    )
-    assert (
-        calc_status_code(
-            995, -50000, current_ts, current_ts + timedelta(days=10)
-        ) != SC_OK
-    )
-    assert (
-        calc_status_code(
-            980, -50000, current_ts, current_ts + timedelta(days=10)
-        ) == SC_OK
-    )
-    pt.recipient_creditor_id = 0
-    db_session.commit()
-    assert (
-        calc_status_code(
-            1000, -50000, current_ts, current_ts + timedelta(days=10)
-        ) != SC_OK
-    )
-    pt.recipient_creditor_id = 1
-    pt.sender_creditor_id = 0
-    db_session.commit()
-    assert (
-        calc_status_code(
-            1000, -50000, current_ts, current_ts + timedelta(days=10)
-        ) == SC_OK
-    )
 
+@pytest.mark.parametrize(
+    "case",
+    list(CALC_STATUS_CODE_CASES.values()),
+    ids=list(CALC_STATUS_CODE_CASES),
+)
+def test_calc_status_code_sp(status_codes, case):
+    assert case in status_codes
+    assert (status_codes[case] == models.SC_OK) == case.is_ok
 
+
+@pytest.mark.usefixtures("configured_account")
 def test_process_finalization_requests(db_session, current_ts):
-    p.configure_account(D_ID, C_ID, current_ts, 0)
     p.configure_account(D_ID, 1234, current_ts, 0)
     q = models.Account.query.filter_by(debtor_id=D_ID, creditor_id=C_ID)
     last_transfer_number = q.one().last_transfer_number
@@ -490,10 +676,7 @@ def test_process_finalization_requests(db_session, current_ts):
     p.finalize_transfer(D_ID, C_ID, pt.transfer_id, "direct", 1, 2, 40)
 
     db_session.execute(
-        text(
-            "SELECT process_finalization_requests("
-            " :debtor_id, :sender_creditor_id, :ignore_all)"
-        ),
+        PROCESS_FINALIZATION_REQUESTS,
         {
             "debtor_id": D_ID,
             "sender_creditor_id": C_ID,
@@ -501,10 +684,10 @@ def test_process_finalization_requests(db_session, current_ts):
         },
     )
 
-    assert len(models.PreparedTransfer.query.all()) == 0
-    assert len(models.FinalizationRequest.query.all()) == 0
-    assert len(models.PendingBalanceChangeSignal.query.all()) == 1
-    assert len(models.AccountTransferSignal.query.all()) == 1
+    assert models.PreparedTransfer.query.count() == 0
+    assert models.FinalizationRequest.query.count() == 0
+    assert models.PendingBalanceChangeSignal.query.count() == 1
+    assert models.AccountTransferSignal.query.count() == 1
 
     account = (
         models.Account.query
@@ -532,22 +715,12 @@ def test_calc_due_interest(db_session, current_ts):
         interest_rate=10.0,
     )
     db_session.add(account)
-    db_session.commit()
+    db_session.flush()
 
     def calc_due_interest(amount, due_ts, curr_ts):
         return (
             db_session.execute(
-                text(
-                    "SELECT * FROM calc_due_interest("
-                    "("
-                    "  SELECT a::account_data "
-                    f" FROM (SELECT {ACCOUNT_DATA_FIELDS} FROM account) a"
-                    "),"
-                    " :amount,"
-                    " :due_ts,"
-                    " :current_ts"
-                    ")"
-                ),
+                CALC_DUE_INTEREST,
                 {
                     "amount": amount,
                     "due_ts": due_ts,
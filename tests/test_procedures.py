@@ -1,5 +1,5 @@
 import pytest
-from datetime import datetime, timezone, timedelta
+from datetime import timedelta
 from swpt_accounts import __version__
 from swpt_accounts import procedures as p
 from swpt_accounts.extensions import db
@@ -35,11 +35,6 @@ def test_version(db_session):
     assert __version__
 
 
-@pytest.fixture(scope="function")
-def current_ts():
-    return datetime.now(tz=timezone.utc)
-
-
 def _flush_balance_change_signals():
     signals = PendingBalanceChangeSignal.query.all()
     for s in signals:
@@ -127,14 +122,14 @@ def test_configure_account(db_session, current_ts):
 
 def test_ignored_config(db_session, current_ts):
     p.configure_account(D_ID, C_ID, current_ts, 0)
-    assert len(AccountUpdateSignal.query.all()) == 1
-    assert len(RejectedConfigSignal.query.all()) == 0
+    assert AccountUpdateSignal.query.count() == 1
+    assert RejectedConfigSignal.query.count() == 0
 
     p.configure_account(D_ID, C_ID, current_ts, 0)
     p.configure_account(D_ID, C_ID, current_ts, -1)
     p.configure_account(D_ID, C_ID, current_ts - timedelta(microseconds=1), 1)
-    assert len(AccountUpdateSignal.query.all()) == 1
-    assert len(RejectedConfigSignal.query.all()) == 0
+    assert AccountUpdateSignal.query.count() == 1
+    assert RejectedConfigSignal.query.count() == 0
 
 
 def test_invalid_config(db_session, current_ts):
@@ -148,7 +143,7 @@ def test_invalid_config(db_session, current_ts):
         config_data="xxx",
     )
     assert p.get_account(D_ID, C_ID) is None
-    assert len(AccountUpdateSignal.query.all()) == 0
+    assert AccountUpdateSignal.query.count() == 0
     rcs = RejectedConfigSignal.query.one()
     assert rcs.debtor_id == D_ID
     assert rcs.creditor_id == C_ID
@@ -177,15 +172,15 @@ def test_invalid_config(db_session, current_ts):
         message_max_delay_seconds=900 * 86400,
     )
     assert p.get_account(D_ID, C_ID) is None
-    assert len(AccountUpdateSignal.query.all()) == 0
-    assert len(RejectedConfigSignal.query.all()) == 1
+    assert AccountUpdateSignal.query.count() == 0
+    assert RejectedConfigSignal.query.count() == 1
 
 
 def test_update_debtor_info(db_session, current_ts):
     # The account does not exist.
     p.update_debtor_info(D_ID, C_ID, None, None, None)
     assert p.get_account(D_ID, C_ID) is None
-    assert len(AccountUpdateSignal.query.all()) == 0
+    assert AccountUpdateSignal.query.count() == 0
 
     # The account does exist.
     p.configure_account(D_ID, C_ID, current_ts, 0)
@@ -196,27 +191,27 @@ def test_update_debtor_info(db_session, current_ts):
     assert a.debtor_info_iri == "http://example.com"
     assert a.debtor_info_sha256 == 32 * b"a"
     assert a.debtor_info_content_type == "text/plain"
-    assert len(AccountUpdateSignal.query.all()) == 2
+    assert AccountUpdateSignal.query.count() == 2
 
     # No change.
     p.update_debtor_info(
         D_ID, C_ID, "http://example.com", 32 * b"a", "text/plain", current_ts
     )
-    assert len(AccountUpdateSignal.query.all()) == 2
+    assert AccountUpdateSignal.query.count() == 2
 
 
 def test_set_interest_rate(db_session, current_ts):
     # The account does not exist.
     p.change_interest_rate(D_ID, C_ID, 7.0, current_ts)
     assert p.get_account(D_ID, C_ID) is None
-    assert len(AccountUpdateSignal.query.all()) == 0
+    assert AccountUpdateSignal.query.count() == 0
 
     # The account does exist.
     p.configure_account(D_ID, C_ID, current_ts, 0)
     p.change_interest_rate(D_ID, C_ID, 7.0, current_ts)
     a = p.get_account(D_ID, C_ID)
     assert a.interest_rate == 7.0
-    assert len(AccountUpdateSignal.query.all()) == 2
+    assert AccountUpdateSignal.query.count() == 2
 
     # Changing the interest rate too often.
     p.change_interest_rate(D_ID, C_ID, 1.0, current_ts)
@@ -268,11 +263,9 @@ def test_make_debtor_payment(db_session, current_ts, amount):
     ).one()
     assert root_change.principal_delta == -amount
     assert (
-        len(
-            PendingBalanceChangeSignal.query.filter_by(
-                debtor_id=D_ID, creditor_id=C_ID
-            ).all()
-        )
+        PendingBalanceChangeSignal.query.filter_by(
+            debtor_id=D_ID, creditor_id=C_ID
+        ).count()
         == 0
     )
     a = p.get_account(D_ID, C_ID)
@@ -286,8 +279,7 @@ def test_make_debtor_payment(db_session, current_ts, amount):
     if amount < 0:
         transfer_number1 += 1
         assert (
-            len(AccountTransferSignal.query.filter_by(debtor_id=D_ID).all())
-            == 1
+            AccountTransferSignal.query.filter_by(debtor_id=D_ID).count() == 1
         )
         cts1 = AccountTransferSignal.query.filter_by(
             debtor_id=D_ID, creditor_id=C_ID
@@ -300,11 +292,9 @@ def test_make_debtor_payment(db_session, current_ts, amount):
         assert cts1.transfer_number == transfer_number1
         assert cts1.principal == amount
         assert (
-            len(
-                AccountTransferSignal.query.filter_by(
-                    debtor_id=D_ID, creditor_id=p.ROOT_CREDITOR_ID
-                ).all()
-            )
+            AccountTransferSignal.query.filter_by(
+                debtor_id=D_ID, creditor_id=p.ROOT_CREDITOR_ID
+            ).count()
             == 0
         )
         cts1_obj = cts1.__marshmallow_schema__.dump(cts1)
@@ -325,8 +315,7 @@ def test_make_debtor_payment(db_session, current_ts, amount):
         assert cts1_obj["principal"] == amount
     else:
         assert (
-            len(AccountTransferSignal.query.filter_by(debtor_id=D_ID).all())
-            == 0
+            AccountTransferSignal.query.filter_by(debtor_id=D_ID).count() == 0
         )
 
     p.make_debtor_payment(
@@ -344,11 +333,11 @@ def test_make_debtor_payment(db_session, current_ts, amount):
 def test_make_debtor_zero_payment(db_session, current_ts):
     p.configure_account(D_ID, C_ID, current_ts, 0)
     p.make_debtor_payment("interest", D_ID, C_ID, 0)
-    assert not PendingBalanceChangeSignal.query.all()
+    assert PendingBalanceChangeSignal.query.count() == 0
     _flush_balance_change_signals()
     p.process_pending_balance_changes(D_ID, C_ID)
     p.process_pending_balance_changes(D_ID, p.ROOT_CREDITOR_ID)
-    assert not AccountTransferSignal.query.all()
+    assert AccountTransferSignal.query.count() == 0
 
 
 def test_make_debtor_creditor_account_deletion(db_session, current_ts, amount):
@@ -378,9 +367,12 @@ def test_make_debtor_interest_payment(db_session, current_ts, amount):
         debtor_id=D_ID, creditor_id=p.ROOT_CREDITOR_ID
     ).one()
     assert root_change.principal_delta == -amount
-    assert not PendingBalanceChangeSignal.query.filter_by(
-        debtor_id=D_ID, creditor_id=C_ID
-    ).all()
+    assert (
+        PendingBalanceChangeSignal.query.filter_by(
+            debtor_id=D_ID, creditor_id=C_ID
+        ).count()
+        == 0
+    )
     assert p.get_account(D_ID, C_ID).principal == amount
     assert p.get_account(D_ID, C_ID).interest == -amount
     cts = AccountTransferSignal.query.filter_by(debtor_id=D_ID).one()
@@ -615,13 +607,13 @@ def test_delete_account(db_session, current_ts):
         1,
         config_flags=Account.CONFIG_SCHEDULED_FOR_DELETION_FLAG,
     )
-    assert len(AccountUpdateSignal.query.all()) == 2
+    assert AccountUpdateSignal.query.count() == 2
     p.try_to_delete_account(D_ID, C_ID)
     assert p.get_account(D_ID, C_ID) is None
     q = Account.query.filter_by(debtor_id=D_ID, creditor_id=C_ID)
     assert q.one().status_flags & Account.STATUS_DELETED_FLAG
     assert q.one().config_flags & Account.CONFIG_SCHEDULED_FOR_DELETION_FLAG
-    assert len(AccountUpdateSignal.query.all()) == 3
+    assert AccountUpdateSignal.query.count() == 3
 
 
 def test_delete_account_negative_balance(db_session, current_ts):
@@ -686,7 +678,7 @@ def test_delete_account_tiny_positive_balance(db_session, current_ts):
     p.process_pending_balance_changes(D_ID, C_ID)
     p.process_pending_balance_changes(D_ID, p.ROOT_CREDITOR_ID)
 
-    assert len(AccountTransferSignal.query.all()) == 1
+    assert AccountTransferSignal.query.count() == 1
     cts1 = AccountTransferSignal.query.filter_by(creditor_id=C_ID).one()
     assert cts1.acquired_amount == -2
     assert cts1.principal == 0
@@ -757,7 +749,7 @@ def test_resurrect_deleted_account_transfer(db_session, current_ts):
 
 def test_prepare_no_sender_account(db_session, current_ts):
     p.configure_account(D_ID, 1234, current_ts, 0)
-    assert len(AccountUpdateSignal.query.all()) == 1
+    assert AccountUpdateSignal.query.count() == 1
     p.prepare_transfer(
         coordinator_type="test",
         coordinator_id=1,
@@ -771,8 +763,8 @@ def test_prepare_no_sender_account(db_session, current_ts):
     )
     p.process_transfer_requests(D_ID, C_ID)
     assert p.get_account(D_ID, C_ID) is None
-    assert len(PreparedTransfer.query.all()) == 0
-    assert len(PreparedTransferSignal.query.all()) == 0
+    assert PreparedTransfer.query.count() == 0
+    assert PreparedTransferSignal.query.count() == 0
     rts = RejectedTransferSignal.query.one()
     assert rts.debtor_id == D_ID
     assert rts.coordinator_type == "test"
@@ -784,7 +776,7 @@ def test_prepare_no_sender_account(db_session, current_ts):
 def test_prepare_transfer_insufficient_funds(db_session, current_ts):
     p.configure_account(D_ID, 1234, current_ts, 0)
     p.configure_account(D_ID, C_ID, current_ts, 0)
-    assert len(AccountUpdateSignal.query.all()) == 2
+    assert AccountUpdateSignal.query.count() == 2
     p.prepare_transfer(
         coordinator_type="test",
         coordinator_id=1,
@@ -803,11 +795,11 @@ def test_prepare_transfer_insufficient_funds(db_session, current_ts):
     _flush_balance_change_signals()
     p.process_pending_balance_changes(D_ID, 1234)
     p.process_pending_balance_changes(D_ID, C_ID)
-    assert len(AccountUpdateSignal.query.all()) == 2
-    assert len(PreparedTransfer.query.all()) == 0
-    assert len(PreparedTransferSignal.query.all()) == 0
-    assert len(AccountTransferSignal.query.all()) == 0
-    assert len(FinalizedTransferSignal.query.all()) == 0
+    assert AccountUpdateSignal.query.count() == 2
+    assert PreparedTransfer.query.count() == 0
+    assert PreparedTransferSignal.query.count() == 0
+    assert AccountTransferSignal.query.count() == 0
+    assert FinalizedTransferSignal.query.count() == 0
     rts = RejectedTransferSignal.query.one()
     assert rts.debtor_id == D_ID
     assert rts.coordinator_type == "test"
@@ -891,7 +883,7 @@ def test_prepare_transfer_managed_by_same_agent(db_session, current_ts):
         ts=current_ts,
     )
     p.process_transfer_requests(D_ID, 0x000001ffffffffff)
-    assert len(PreparedTransferSignal.query.all()) == 1
+    assert PreparedTransferSignal.query.count() == 1
 
 
 def test_prepare_transfer_not_managed_by_same_agent(db_session, current_ts):
@@ -969,7 +961,7 @@ def test_prepare_transfer_success(db_session, current_ts):
     assert 1234 != C_ID
     p.configure_account(D_ID, C_ID, current_ts, 0)
     p.configure_account(D_ID, 1234, current_ts, 0)
-    assert len(AccountUpdateSignal.query.all()) == 2
+    assert AccountUpdateSignal.query.count() == 2
     q = Account.query.filter_by(debtor_id=D_ID, creditor_id=C_ID)
     q.update({Account.principal: 100})
     p.prepare_transfer(
@@ -990,9 +982,9 @@ def test_prepare_transfer_success(db_session, current_ts):
     _flush_balance_change_signals()
     p.process_pending_balance_changes(D_ID, 1234)
     p.process_pending_balance_changes(D_ID, C_ID)
-    assert len(AccountUpdateSignal.query.all()) == 2
-    assert len(RejectedTransferSignal.query.all()) == 0
-    assert len(FinalizedTransferSignal.query.all()) == 0
+    assert AccountUpdateSignal.query.count() == 2
+    assert RejectedTransferSignal.query.count() == 0
+    assert FinalizedTransferSignal.query.count() == 0
     pts = PreparedTransferSignal.query.one()
     assert pts.debtor_id == D_ID
     assert pts.coordinator_type == "test"
@@ -1038,10 +1030,10 @@ def test_prepare_transfer_success(db_session, current_ts):
     assert a.pending_transfers_count == 0
     assert a.principal == 100
     assert a.interest == 0.0
-    assert not PreparedTransfer.query.one_or_none()
-    assert len(AccountUpdateSignal.query.all()) == 2
-    assert len(RejectedTransferSignal.query.all()) == 0
-    assert len(AccountTransferSignal.query.all()) == 0
+    assert PreparedTransfer.query.count() == 0
+    assert AccountUpdateSignal.query.count() == 2
+    assert RejectedTransferSignal.query.count() == 0
+    assert AccountTransferSignal.query.count() == 0
     fpt = FinalizedTransferSignal.query.one()
     fpt_obj = fpt.__marshmallow_schema__.dump(fpt)
     assert fpt_obj["debtor_id"] == D_ID
@@ -1092,14 +1084,12 @@ def test_commit_prepared_transfer(db_session, current_ts):
     assert a2.pending_transfers_count == 0
     assert a2.principal == 60
     assert a2.interest == 0.0
-    assert not PreparedTransfer.query.one_or_none()
-    assert len(AccountUpdateSignal.query.all()) >= 2
-    assert len(RejectedTransferSignal.query.all()) == 0
-    assert len(FinalizedTransferSignal.query.all()) == 1
+    assert PreparedTransfer.query.count() == 0
+    assert AccountUpdateSignal.query.count() >= 2
+    assert RejectedTransferSignal.query.count() == 0
+    assert FinalizedTransferSignal.query.count() == 1
 
-    assert (
-        len(AccountTransferSignal.query.filter_by(debtor_id=D_ID).all()) == 2
-    )
+    assert AccountTransferSignal.query.filter_by(debtor_id=D_ID).count() == 2
     cts1 = AccountTransferSignal.query.filter_by(
         debtor_id=D_ID, creditor_id=C_ID
     ).one()
@@ -1150,10 +1140,10 @@ def test_commit_issuing_transfer(db_session, current_ts):
     assert a2.pending_transfers_count == 0
     assert a2.principal == -200
     assert a2.interest == 0.0
-    assert not PreparedTransfer.query.one_or_none()
-    assert len(AccountUpdateSignal.query.all()) >= 2
-    assert len(RejectedTransferSignal.query.all()) == 0
-    assert len(FinalizedTransferSignal.query.all()) == 1
+    assert PreparedTransfer.query.count() == 0
+    assert AccountUpdateSignal.query.count() >= 2
+    assert RejectedTransferSignal.query.count() == 0
+    assert FinalizedTransferSignal.query.count() == 1
 
 
 def test_root_config_issuing_limit(db_session, current_ts):
@@ -1172,8 +1162,8 @@ def test_root_config_issuing_limit(db_session, current_ts):
         ts=current_ts,
     )
     p.process_transfer_requests(D_ID, ROOT_CREDITOR_ID)
-    assert len(RejectedTransferSignal.query.all()) == 1
-    assert len(PreparedTransfer.query.all()) == 0
+    assert RejectedTransferSignal.query.count() == 1
+    assert PreparedTransfer.query.count() == 0
 
 
 def test_negligible_amount_issuing_limit(db_session, current_ts):
@@ -1191,8 +1181,8 @@ def test_negligible_amount_issuing_limit(db_session, current_ts):
         ts=current_ts,
     )
     p.process_transfer_requests(D_ID, ROOT_CREDITOR_ID)
-    assert len(RejectedTransferSignal.query.all()) == 1
-    assert len(PreparedTransfer.query.all()) == 0
+    assert RejectedTransferSignal.query.count() == 1
+    assert PreparedTransfer.query.count() == 0
 
 
 def test_zero_locked_amount_unsuccessful_commit(db_session, current_ts):
@@ -1352,10 +1342,8 @@ def test_commit_to_debtor_account(db_session, current_ts):
     _flush_balance_change_signals()
     p.process_pending_balance_changes(D_ID, p.ROOT_CREDITOR_ID)
     p.process_pending_balance_changes(D_ID, C_ID)
-    assert (
-        len(AccountTransferSignal.query.filter_by(debtor_id=D_ID).all()) == 1
-    )
-    assert len(FinalizedTransferSignal.query.all()) == 1
+    assert AccountTransferSignal.query.filter_by(debtor_id=D_ID).count() == 1
+    assert FinalizedTransferSignal.query.count() == 1
     cts1 = AccountTransferSignal.query.filter_by(
         debtor_id=D_ID, creditor_id=C_ID
     ).one()
@@ -1489,7 +1477,7 @@ def test_calc_status_code(db_session, current_ts):
 def test_finalize_transfer_twice(db_session):
     p.finalize_transfer(D_ID, C_ID, 1, "test", 1, 2, 0)
     p.finalize_transfer(D_ID, C_ID, 1, "test", 1, 2, 0)
-    assert len(FinalizationRequest.query.all()) == 1
+    assert FinalizationRequest.query.count() == 1
 
 
 def test_account_purge_signal(db_session, current_ts):
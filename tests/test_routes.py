@@ -1,4 +1,3 @@
-from datetime import datetime, timezone
 import pytest
 from swpt_accounts import procedures as p
 from swpt_accounts import models as m
@@ -12,11 +11,6 @@ def client(app, db_session):
     return app.test_client()
 
 
-@pytest.fixture(scope="function")
-def current_ts():
-    return datetime.now(tz=timezone.utc)
-
-
 @pytest.fixture(scope="function")
 def account(app, db_session, current_ts):
     return p.configure_account(D_ID, C_ID, current_ts, 0)